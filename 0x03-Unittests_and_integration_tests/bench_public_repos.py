@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark public_repos against a local fake GitHub API.
+
+Compares the concurrent, Link-paginated listing with fetching the same
+pages one after another. Every fake page takes LATENCY seconds to serve.
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import utils
+from client import GithubOrgClient
+
+LATENCY = 0.05
+REPOS = 3000
+
+
+class FakeGithub(BaseHTTPRequestHandler):
+    """Serve an org and REPOS repos in pages, like api.github.com."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self) -> None:
+        """Serve /orgs/<org> or a page of /orgs/<org>/repos."""
+        time.sleep(LATENCY)
+        port = self.server.server_port
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query))
+        headers = {}
+        if parts.path.endswith("/repos"):
+            per_page = int(query.get("per_page", 30))
+            page = int(query.get("page", 1))
+            last = (REPOS + per_page - 1) // per_page
+            start = (page - 1) * per_page
+            body = [{"name": "repo{}".format(i),
+                     "license": {"key": "mit" if i % 2 else "apache-2.0"}}
+                    for i in range(start, min(start + per_page, REPOS))]
+            base = "http://127.0.0.1:{}{}?per_page={}".format(
+                port, parts.path, per_page)
+            if page < last:
+                headers["Link"] = '<{0}&page={1}>; rel="next", ' \
+                    '<{0}&page={2}>; rel="last"'.format(base, page + 1, last)
+        else:
+            body = {"repos_url": "http://127.0.0.1:{}{}/repos".format(
+                port, parts.path)}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        """Keep benchmark output quiet."""
+
+
+def sequential_names(client: GithubOrgClient) -> list:
+    """Fetch every page one by one (previous behaviour, all pages)."""
+    names = []
+    for page in utils.get_json_pages(client._public_repos_url,
+                                     {"per_page": client.PER_PAGE},
+                                     max_workers=1):
+        names.extend(repo["name"] for repo in page)
+    return names
+
+
+def main() -> None:
+    """Run both variants and print the timings."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGithub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    GithubOrgClient.ORG_URL = "http://127.0.0.1:{}/orgs/{{}}".format(
+        server.server_port)
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    client = GithubOrgClient("fake")
+
+    start = time.perf_counter()
+    count = len(sequential_names(client))
+    print("sequential: {} repos in {:.2f}s".format(
+        count, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    count = sum(1 for _ in client.repos_payload(max_workers=workers))
+    print("concurrent ({} workers): {} repos in {:.2f}s".format(
+        workers, count, time.perf_counter() - start))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
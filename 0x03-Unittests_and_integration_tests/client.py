@@ -6,23 +6,25 @@ Client module for the Github API.
 # Try relative import first (works when used as a package).
 # Fallback to absolute import (works when run as a script).
 try:
-    from .utils import get_json
+    from .utils import access_nested_map, get_json, iter_json_items, memoize
 except Exception:
-    from utils import get_json
+    from utils import access_nested_map, get_json, iter_json_items, memoize
+from typing import Dict, Iterator, List, Optional
 
 
 class GithubOrgClient:
     """A client to interact with GitHub organizations."""
 
     ORG_URL = "https://api.github.com/orgs/{}"
+    PER_PAGE = 100  # GitHub's maximum page size
 
     def __init__(self, org_name):
         """Initialize with organization name."""
         self._org_name = org_name
 
-    @property
+    @memoize
     def org(self):
-        """Return organization data from GitHub API."""
+        """Return organization data from GitHub API (fetched once)."""
         return get_json(self.ORG_URL.format(self._org_name))
 
     @property
@@ -30,7 +32,33 @@ class GithubOrgClient:
         """Return public repos URL from the org payload."""
         return self.org.get("repos_url")
 
-    def public_repos(self):
-        """Return a list with names of public repositories."""
-        repos = get_json(self._public_repos_url)
-        return [repo.get("name") for repo in repos]
+    def repos_payload(self, max_workers: int = 4) -> Iterator[Dict]:
+        """Lazily yield public repo records from every page.
+
+        Only public repos are requested (type=public is filtered by the
+        API). The first page is decoded as it streams in and the rest are
+        fetched concurrently over the shared session; with the HTTP cache
+        enabled every page is served or revalidated through it instead.
+        """
+        params = {"type": "public", "per_page": self.PER_PAGE}
+        yield from iter_json_items(self._public_repos_url, params,
+                                   max_workers)
+
+    def public_repos(self, license: Optional[str] = None) -> List[str]:
+        """Return a list with names of public repositories.
+
+        GitHub can't filter org repos by license, so that filter is
+        applied to each record as it streams in.
+        """
+        return [
+            repo.get("name") for repo in self.repos_payload()
+            if license is None or self.has_license(repo, license)
+        ]
+
+    @staticmethod
+    def has_license(repo: Dict, license_key: str) -> bool:
+        """Return True if the repo's license key matches license_key."""
+        try:
+            return access_nested_map(repo, ("license", "key")) == license_key
+        except KeyError:
+            return False
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """Integration tests for GithubOrgClient"""
+import json
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from client import GithubOrgClient
 from fixtures import TEST_PAYLOAD
 
@@ -11,12 +12,22 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        """Start patcher"""
-        cls.get_patcher = patch('requests.get')
-        mock_get = cls.get_patcher.start()
-        mock_get.return_value.json.side_effect = [
-            TEST_PAYLOAD["org"], TEST_PAYLOAD["repos"]
-        ]
+        """Start patcher on the shared session used by get_json"""
+        payloads = {
+            GithubOrgClient.ORG_URL.format("google"): TEST_PAYLOAD["org"],
+            TEST_PAYLOAD["org"]["repos_url"]: TEST_PAYLOAD["repos"],
+        }
+
+        def fake_get(url, **kwargs):
+            """Answer with the fixture payload for url (query ignored)"""
+            payload = payloads[url.split("?")[0]]
+            response = MagicMock(links={})
+            response.json.return_value = payload
+            response.iter_content.return_value = [json.dumps(payload).encode()]
+            return response
+
+        cls.get_patcher = patch('requests.Session.get', side_effect=fake_get)
+        cls.get_patcher.start()
 
     @classmethod
     def tearDownClass(cls):
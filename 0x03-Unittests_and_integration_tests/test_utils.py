@@ -2,14 +2,37 @@
 """
 Unit tests for the utils module.
 
-This file contains tests for the memoize decorator.
+This file contains tests for the memoize decorator and the HTTP cache
+behind get_json.
 """
 
+import copy
+import gzip
+import json
+import pickle
+import shutil
+import tempfile
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlsplit
 from unittest.mock import patch
+
+import utils
 from utils import memoize
 
 
+class MemoizedRecord:
+    """Module-level class with a memoized property, so it can be pickled."""
+
+    @memoize
+    def value(self) -> int:
+        """Return a fixed value."""
+        return 42
+
+
 class TestMemoize(unittest.TestCase):
     """Unit tests for utils.memoize decorator."""
 
@@ -46,6 +69,412 @@ class TestMemoize(unittest.TestCase):
             # Ensure a_method is only called once
             mock_method.assert_called_once()
 
+    def test_memoize_single_flight(self) -> None:
+        """Test that concurrent first reads compute the value only once."""
+        calls = []
+
+        class TestClass:
+            """Class with a slow memoized property."""
+
+            @memoize
+            def slow(self) -> int:
+                """Record the call and take a while to return."""
+                calls.append(1)
+                time.sleep(0.05)
+                return 42
+
+        obj = TestClass()
+        barrier = threading.Barrier(8)
+        results = []
+
+        def read() -> None:
+            """Read the property once every thread is ready."""
+            barrier.wait()
+            results.append(obj.slow)
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(obj.__dict__["slow"], 42)
+
+    def test_memoize_instances_compute_in_parallel(self) -> None:
+        """Test that first reads on different instances do not serialize."""
+
+        class TestClass:
+            """Class with a slow memoized property."""
+
+            @memoize
+            def slow(self) -> int:
+                """Take a while to return."""
+                time.sleep(0.2)
+                return 42
+
+        objs = [TestClass() for _ in range(8)]
+        threads = [threading.Thread(target=lambda o=o: o.slow) for o in objs]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertEqual([obj.__dict__["slow"] for obj in objs], [42] * 8)
+        self.assertEqual(TestClass.slow._in_flight, {})
+
+    def test_memoized_instance_pickles_and_copies(self) -> None:
+        """Test that no lock is left on the instance after a first read."""
+        obj = MemoizedRecord()
+        self.assertEqual(obj.value, 42)
+        self.assertEqual(obj.__dict__, {"value": 42})
+        self.assertEqual(pickle.loads(pickle.dumps(obj)).value, 42)
+        self.assertEqual(copy.deepcopy(obj).value, 42)
+
+    def test_memoize_ttl_and_invalidate(self) -> None:
+        """Test that values expire after the TTL and on invalidation."""
+        calls = []
+
+        class TestClass:
+            """Class with a memoized property that expires."""
+
+            @memoize(ttl=10)
+            def value(self) -> int:
+                """Return how many times it has been computed."""
+                calls.append(1)
+                return len(calls)
+
+        obj = TestClass()
+        with patch("utils.time.monotonic", return_value=100.0):
+            self.assertEqual(obj.value, 1)
+            self.assertEqual(obj.value, 1)
+        with patch("utils.time.monotonic", return_value=111.0):
+            self.assertEqual(obj.value, 2)
+            utils.invalidate(obj, "value")
+            self.assertEqual(obj.value, 3)
+
+    def test_memoize_slots(self) -> None:
+        """Test that classes with __slots__ store the value in a slot."""
+
+        class TestClass:
+            """Slotted class reserving storage for the memoized value."""
+
+            __slots__ = ("_value",)
+
+            @memoize
+            def value(self) -> int:
+                """Return a fixed value."""
+                return 7
+
+        obj = TestClass()
+        self.assertEqual(obj.value, 7)
+        self.assertEqual(obj._value, (7, None))
+
+
+class StubGithubHandler(BaseHTTPRequestHandler):
+    """Serve JSON with validators, recording every request it receives."""
+
+    payloads: Dict[str, Dict] = {}
+    requests: List[Dict] = []
+
+    def do_GET(self) -> None:
+        """Answer 304 when the ETag matches, 200 with the payload otherwise."""
+        payload = self.payloads[self.path]
+        self.requests.append({
+            "path": self.path,
+            "if_none_match": self.headers.get("If-None-Match"),
+        })
+        etag = payload["etag"]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", payload["cache_control"])
+            self.end_headers()
+            return
+        body = json.dumps(payload["body"]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", payload["cache_control"])
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        """Keep test output quiet."""
+
+
+class TestHTTPCache(unittest.TestCase):
+    """Tests for get_json with the on-disk HTTP cache enabled."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Start the stub HTTP server on a free local port."""
+        cls.server = HTTPServer(("127.0.0.1", 0), StubGithubHandler)
+        cls.base_url = "http://127.0.0.1:{}".format(cls.server.server_port)
+        cls.thread = threading.Thread(target=cls.server.serve_forever,
+                                      daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stop the stub HTTP server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        """Use a fresh cache directory and payload set for every test."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = utils.enable_http_cache(self.cache_dir)
+        StubGithubHandler.requests = []
+        StubGithubHandler.payloads = {
+            "/orgs/google": {"body": {"login": "google"}, "etag": '"v1"',
+                             "cache_control": "public, max-age=60"},
+            "/orgs/stale": {"body": {"login": "stale"}, "etag": '"v2"',
+                            "cache_control": "no-cache"},
+            "/orgs/secret": {"body": {"login": "secret"}, "etag": '"v3"',
+                             "cache_control": "no-store"},
+        }
+
+    def tearDown(self) -> None:
+        """Disable the cache and remove its directory."""
+        utils.disable_http_cache()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_fresh_entry_skips_request(self) -> None:
+        """Test that a response within max-age is served from the cache."""
+        url = self.base_url + "/orgs/google"
+        self.assertEqual(utils.get_json(url), {"login": "google"})
+        self.assertEqual(utils.get_json(url), {"login": "google"})
+        self.assertEqual(len(StubGithubHandler.requests), 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_stale_entry_is_revalidated(self) -> None:
+        """Test that a no-cache entry is revalidated with its ETag."""
+        url = self.base_url + "/orgs/stale"
+        utils.get_json(url)
+        self.assertEqual(utils.get_json(url), {"login": "stale"})
+        self.assertEqual(
+            [r["if_none_match"] for r in StubGithubHandler.requests],
+            [None, '"v2"']
+        )
+        self.assertEqual(self.cache.stats()["revalidated"], 1)
+
+    def test_no_store_is_not_cached(self) -> None:
+        """Test that a no-store response is fetched again every time."""
+        url = self.base_url + "/orgs/secret"
+        utils.get_json(url)
+        utils.get_json(url)
+        self.assertEqual(len(StubGithubHandler.requests), 2)
+        self.assertIsNone(self.cache.load(url))
+
+    def test_cache_persists_on_disk(self) -> None:
+        """Test that a new cache on the same directory reuses entries."""
+        url = self.base_url + "/orgs/google"
+        utils.get_json(url)
+        utils.enable_http_cache(self.cache_dir)
+        self.assertEqual(utils.get_json(url), {"login": "google"})
+        self.assertEqual(len(StubGithubHandler.requests), 1)
+
+    def test_disabled_cache_calls_requests(self) -> None:
+        """Test that get_json fetches directly when the cache is off."""
+        utils.disable_http_cache()
+        with patch("requests.Session.get") as mock_get:
+            mock_get.return_value.json.return_value = {"payload": True}
+            self.assertEqual(utils.get_json("http://example.com"),
+                             {"payload": True})
+            mock_get.assert_called_once_with("http://example.com")
+
+
+class StubPagesHandler(BaseHTTPRequestHandler):
+    """Serve a paginated JSON array with GitHub-style Link headers."""
+
+    total_pages = 5
+    with_last = True
+    requested: List[int] = []
+    not_modified: List[int] = []
+
+    def do_GET(self) -> None:
+        """Return page N with next (and optionally last) links."""
+        query = dict(parse_qsl(urlsplit(self.path).query))
+        page = int(query.get("page", 1))
+        self.requested.append(page)
+        etag = '"page-{}"'.format(page)
+        if self.headers.get("If-None-Match") == etag:
+            self.not_modified.append(page)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        base = "http://127.0.0.1:{}/repos?per_page=2".format(
+            self.server.server_port)
+        links = []
+        if page < self.total_pages:
+            links.append('<{}&page={}>; rel="next"'.format(base, page + 1))
+            if self.with_last:
+                links.append('<{}&page={}>; rel="last"'.format(
+                    base, self.total_pages))
+        body = json.dumps([{"page": page, "n": i} for i in range(2)]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        if links:
+            self.send_header("Link", ", ".join(links))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        """Keep test output quiet."""
+
+
+class TestGetJsonPages(unittest.TestCase):
+    """Tests for Link-header pagination in get_json_pages."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Start the paginated stub server on a free local port."""
+        cls.server = HTTPServer(("127.0.0.1", 0), StubPagesHandler)
+        cls.url = "http://127.0.0.1:{}/repos".format(cls.server.server_port)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stop the paginated stub server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        """Reset the request log."""
+        StubPagesHandler.requested = []
+        StubPagesHandler.not_modified = []
+        StubPagesHandler.with_last = True
+
+    def test_pages_with_last_link(self) -> None:
+        """Test that every page is fetched once and yielded in order."""
+        pages = list(utils.get_json_pages(self.url, {"per_page": 2},
+                                          max_workers=3))
+        self.assertEqual([page[0]["page"] for page in pages], [1, 2, 3, 4, 5])
+        self.assertEqual(sorted(StubPagesHandler.requested), [1, 2, 3, 4, 5])
+
+    def test_pages_following_next_links(self) -> None:
+        """Test that rel="next" is followed when there is no last link."""
+        StubPagesHandler.with_last = False
+        pages = list(utils.get_json_pages(self.url))
+        self.assertEqual([page[0]["page"] for page in pages], [1, 2, 3, 4, 5])
+        self.assertEqual(StubPagesHandler.requested, [1, 2, 3, 4, 5])
+
+    def test_pages_are_lazy(self) -> None:
+        """Test that the first page is available before the rest load."""
+        StubPagesHandler.with_last = False
+        pages = utils.get_json_pages(self.url)
+        self.assertEqual(next(pages)[0]["page"], 1)
+        self.assertEqual(StubPagesHandler.requested, [1])
+        pages.close()
+
+    def test_pages_are_revalidated_through_cache(self) -> None:
+        """Test that a second listing is answered by 304s from the cache."""
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        self.addCleanup(utils.disable_http_cache)
+        cache = utils.enable_http_cache(cache_dir)
+        first = list(utils.iter_json_items(self.url, {"per_page": 2}))
+        second = list(utils.iter_json_items(self.url, {"per_page": 2}))
+        self.assertEqual(second, first)
+        self.assertEqual(len(second), 10)
+        self.assertEqual(sorted(StubPagesHandler.not_modified),
+                         [1, 2, 3, 4, 5])
+        self.assertEqual(cache.stats()["revalidated"], 5)
+
+
+class StubFlakyHandler(BaseHTTPRequestHandler):
+    """Fail with 503 + Retry-After a set number of times, then gzip JSON."""
+
+    failures_left = 0
+    attempts = 0
+
+    def do_GET(self) -> None:
+        """Answer 503 while failures remain, then a gzipped array."""
+        type(self).attempts += 1
+        if type(self).failures_left > 0:
+            type(self).failures_left -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = gzip.compress(json.dumps([{"id": 1}, {"id": 2}]).encode())
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        """Keep test output quiet."""
+
+
+class TestGetJsonTransport(unittest.TestCase):
+    """Tests for retries, compression and streaming decode."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Start the flaky stub server on a free local port."""
+        cls.server = HTTPServer(("127.0.0.1", 0), StubFlakyHandler)
+        cls.url = "http://127.0.0.1:{}/".format(cls.server.server_port)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stop the flaky stub server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        """Reset the attempt counter."""
+        StubFlakyHandler.attempts = 0
+        StubFlakyHandler.failures_left = 0
+
+    def test_retries_on_503(self) -> None:
+        """Test that 503 responses are retried until one succeeds."""
+        StubFlakyHandler.failures_left = 2
+        self.assertEqual(utils.get_json(self.url), [{"id": 1}, {"id": 2}])
+        self.assertEqual(StubFlakyHandler.attempts, 3)
+
+    def test_gzip_body_streams_items(self) -> None:
+        """Test that a gzipped array is decoded item by item."""
+        items = list(utils.iter_json_items(self.url))
+        self.assertEqual(items, [{"id": 1}, {"id": 2}])
+
+    def test_iter_json_array_across_chunks(self) -> None:
+        """Test that elements split across chunks are decoded correctly."""
+        data = '[{"a": "x,y]"}, 12, 3.5, true, null, ["n"], "\u00e9"]'
+        chunks = [c.encode() for c in data]  # one character per chunk
+        self.assertEqual(list(utils.iter_json_array(chunks)),
+                         json.loads(data))
+
+    def test_iter_json_array_is_lazy(self) -> None:
+        """Test that the first item is yielded before the array ends."""
+        consumed = []
+
+        def chunks():
+            """Yield two chunks, recording how many were consumed."""
+            for chunk in (b'[{"id": 1}, ', b'{"id": 2}]'):
+                consumed.append(chunk)
+                yield chunk
+
+        items = utils.iter_json_array(chunks())
+        self.assertEqual(next(items), {"id": 1})
+        self.assertEqual(len(consumed), 1)
+        self.assertEqual(list(items), [{"id": 2}])
+
+    def test_iter_json_array_truncated(self) -> None:
+        """Test that a body cut off mid-array raises ValueError."""
+        with self.assertRaises(ValueError):
+            list(utils.iter_json_array([b'[{"id": 1}, {"id"']))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""Generic utilities for github org client.
+"""
+import codecs
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Mapping,
+    Sequence,
+    Any,
+    Dict,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode "br" responses)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+__all__ = [
+    "access_nested_map",
+    "get_json",
+    "memoize",
+    "invalidate",
+    "HTTPCache",
+    "enable_http_cache",
+    "disable_http_cache",
+    "get_session",
+    "get_json_pages",
+    "iter_json_array",
+    "iter_json_items",
+]
+
+POOL_SIZE = 10
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CHUNK_SIZE = 64 * 1024
+
+
+def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
+    """Access nested map with key path.
+    Parameters
+    ----------
+    nested_map: Mapping
+        A nested map
+    path: Sequence
+        a sequence of key representing a path to the value
+    Example
+    -------
+    >>> nested_map = {"a": {"b": {"c": 1}}}
+    >>> access_nested_map(nested_map, ["a", "b", "c"])
+    1
+    """
+    for key in path:
+        if not isinstance(nested_map, Mapping):
+            raise KeyError(key)
+        nested_map = nested_map[key]
+
+    return nested_map
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """Split a Cache-Control header into a directive -> value dict."""
+    directives = {}
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+class HTTPCache:
+    """Persistent on-disk cache of JSON responses with revalidation.
+
+    Each URL is stored as one JSON file holding the decoded body, its
+    ETag / Last-Modified validators and its freshness lifetime taken from
+    Cache-Control. Fresh entries are served without any request; stale
+    ones are revalidated with a conditional request, so a 304 costs no
+    body transfer and, on GitHub, nothing against the rate limit.
+    Entries are also kept in memory, so repeated lookups skip the disk.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Create (if needed) and use the cache directory."""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._memory: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _path(self, url: str) -> str:
+        """Return the file that stores the entry for url."""
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".json")
+
+    def load(self, url: str) -> Optional[Dict]:
+        """Return the stored entry for url, or None."""
+        with self._lock:
+            entry = self._memory.get(url)
+        if entry is not None:
+            return entry
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._memory[url] = entry
+        return entry
+
+    def store(self, url: str, entry: Dict) -> None:
+        """Write an entry atomically so concurrent readers never see half."""
+        with self._lock:
+            self._memory[url] = entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(url))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def is_fresh(entry: Dict) -> bool:
+        """Tell whether an entry can be served without revalidation."""
+        if entry.get("no_cache"):
+            return False
+        return time.time() - entry["stored_at"] < entry.get("max_age", 0)
+
+    @staticmethod
+    def validators(entry: Dict) -> Dict[str, str]:
+        """Return the conditional request headers for an entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def make_entry(response: Any, body: Any,
+                   previous: Optional[Dict] = None) -> Optional[Dict]:
+        """Build an entry from a response, or None if it must not be cached.
+
+        On a 304 the validators, Link header and body of the previous
+        entry are kept unless the response sent new ones.
+        """
+        headers = response.headers
+        directives = _parse_cache_control(headers.get("Cache-Control", ""))
+        if "no-store" in directives:
+            return None
+        try:
+            max_age = int(directives.get("max-age") or 0)
+        except ValueError:
+            max_age = 0
+        previous = previous or {}
+        return {
+            "body": body,
+            "etag": headers.get("ETag") or previous.get("etag"),
+            "last_modified": (headers.get("Last-Modified")
+                              or previous.get("last_modified")),
+            "links": response.links or previous.get("links") or {},
+            "max_age": max_age,
+            "no_cache": "no-cache" in directives,
+            "stored_at": time.time(),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, revalidation and miss counters."""
+        return {"hits": self.hits, "revalidated": self.revalidated,
+                "misses": self.misses}
+
+
+http_cache: Optional[HTTPCache] = None
+
+
+def enable_http_cache(directory: Optional[str] = None) -> HTTPCache:
+    """Turn on the shared HTTP cache used by get_json.
+
+    The directory defaults to $GITHUB_HTTP_CACHE_DIR or
+    ~/.cache/github-org-client. Every client instance shares it.
+    """
+    global http_cache
+    directory = directory or os.environ.get(
+        "GITHUB_HTTP_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "github-org-client"),
+    )
+    http_cache = HTTPCache(directory)
+    return http_cache
+
+
+def disable_http_cache() -> None:
+    """Turn off the shared HTTP cache; get_json always fetches again."""
+    global http_cache
+    http_cache = None
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the shared keep-alive session, creating it on first use.
+
+    Its connection pool holds POOL_SIZE connections per host, so
+    concurrent requests reuse warm TLS connections. GETs answered with
+    429 or a 5xx are retried up to MAX_RETRIES times with exponential
+    backoff, waiting for Retry-After when the server sends it.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            retries = Retry(
+                total=MAX_RETRIES,
+                backoff_factor=BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset({"GET"}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE,
+                                  pool_maxsize=POOL_SIZE,
+                                  max_retries=retries)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            _session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        return _session
+
+
+def get_json(url: str) -> Dict:
+    """Get JSON from remote URL.
+
+    Requests go through the shared session (keep-alive, compression,
+    retries). When the HTTP cache is enabled, fresh responses are served
+    from it and stale ones are revalidated with If-None-Match /
+    If-Modified-Since.
+    """
+    cache = http_cache
+    if cache is None:
+        response = get_session().get(url)
+        return response.json()
+    return _cached_get(cache, url)[0]
+
+
+def _cached_get(cache: HTTPCache, url: str,
+                raise_errors: bool = False) -> Tuple[Any, Dict]:
+    """Fetch url through the HTTP cache; return (body, Link header links).
+
+    With raise_errors, an error status raises instead of being decoded.
+    """
+    entry = cache.load(url)
+    if entry is not None and cache.is_fresh(entry):
+        cache.hits += 1
+        return entry["body"], entry.get("links", {})
+
+    headers = cache.validators(entry) if entry is not None else {}
+    response = get_session().get(url, headers=headers)
+    if entry is not None and response.status_code == 304:
+        cache.revalidated += 1
+        body = entry["body"]
+        new_entry = cache.make_entry(response, body, entry)
+    else:
+        cache.misses += 1
+        if raise_errors:
+            response.raise_for_status()
+        body = response.json()
+        new_entry = (cache.make_entry(response, body)
+                     if response.status_code == 200 else None)
+    if new_entry is not None:
+        cache.store(url, new_entry)
+        return body, new_entry["links"]
+    return body, response.links
+
+
+def _with_query(url: str, **params: Any) -> str:
+    """Return url with the given query parameters set or replaced."""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update({key: str(value) for key, value in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _get_page(url: str, stream: bool = False) -> requests.Response:
+    """Fetch one page with the shared session."""
+    response = get_session().get(url, stream=stream)
+    response.raise_for_status()
+    return response
+
+
+def _fetch_page(url: str) -> Tuple[List, Dict]:
+    """Return one page's (body, links), through the HTTP cache if enabled.
+
+    Cached pages cost nothing against the rate limit while fresh and a
+    conditional request once stale, like get_json.
+    """
+    cache = http_cache
+    if cache is not None:
+        return _cached_get(cache, url, raise_errors=True)
+    response = _get_page(url)
+    return response.json(), response.links
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Incrementally decode a top-level JSON array from byte chunks.
+
+    Each element is yielded as soon as its closing character arrives, so
+    a consumer can start on the first items while the rest of the body is
+    still in flight. Only one partial element is ever buffered.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    started = finished = False
+    for chunk in chunks:
+        buffer = buffer[pos:] + text.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer) or finished:
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                finished = True
+                break
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # element not complete yet, wait for more bytes
+            if end == len(buffer):
+                if buffer[end - 1] not in "]}\"":
+                    break  # a number or literal may continue next chunk
+            elif buffer[end] not in " \t\r\n,]":
+                break  # e.g. "3." decoded as 3, wait for the fraction
+            yield item
+            pos = end
+    if not finished:
+        raise ValueError("Truncated JSON array")
+
+
+def get_json_pages(url: str, params: Optional[Dict] = None,
+                   max_workers: int = 4) -> Iterator[List]:
+    """Yield every page of a Link-header paginated JSON array, in order.
+
+    When the first page names the last one (rel="last"), the remaining
+    pages are fetched concurrently, keeping at most 2 * max_workers
+    requests in flight; otherwise rel="next" links are followed one by
+    one. Pages are yielded as soon as they are next in order. Every
+    page goes through the HTTP cache when it is enabled.
+    """
+    if params:
+        url = _with_query(url, **params)
+    body, links = _fetch_page(url)
+    yield body
+
+    last_url = links.get("last", {}).get("url")
+    if last_url is None:
+        next_url = links.get("next", {}).get("url")
+        while next_url:
+            body, links = _fetch_page(next_url)
+            yield body
+            next_url = links.get("next", {}).get("url")
+        return
+
+    yield from _concurrent_pages(last_url, max_workers)
+
+
+def _concurrent_pages(last_url: str, max_workers: int) -> Iterator[List]:
+    """Fetch pages 2..last concurrently and yield their bodies in order."""
+    last_page = int(dict(parse_qsl(urlsplit(last_url).query))["page"])
+    page_urls = (_with_query(last_url, page=page)
+                 for page in range(2, last_page + 1))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: deque = deque()
+        for page_url in page_urls:
+            pending.append(executor.submit(_fetch_page, page_url))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()[0]
+        while pending:
+            yield pending.popleft().result()[0]
+
+
+def iter_json_items(url: str, params: Optional[Dict] = None,
+                    max_workers: int = 4) -> Iterator[Any]:
+    """Yield the elements of a Link-paginated JSON array across pages.
+
+    The first page is streamed and decoded incrementally, so items come
+    out before its body has fully arrived. Remaining pages are fetched
+    concurrently as in get_json_pages (or streamed one by one when only
+    rel="next" links are given). With the HTTP cache enabled pages are
+    read through it instead of streamed, so unchanged pages are not
+    downloaded or counted against the rate limit again.
+    """
+    if params:
+        url = _with_query(url, **params)
+    if http_cache is not None:
+        for page in get_json_pages(url, max_workers=max_workers):
+            yield from page
+        return
+    response = _get_page(url, stream=True)
+    links = response.links
+    with response:
+        yield from iter_json_array(response.iter_content(CHUNK_SIZE))
+
+    last_url = links.get("last", {}).get("url")
+    if last_url is not None:
+        for page in _concurrent_pages(last_url, max_workers):
+            yield from page
+        return
+    next_url = links.get("next", {}).get("url")
+    while next_url:
+        response = _get_page(next_url, stream=True)
+        with response:
+            yield from iter_json_array(response.iter_content(CHUNK_SIZE))
+        next_url = response.links.get("next", {}).get("url")
+
+
+_MISSING = object()
+
+
+class _Memoized:
+    """Per-instance cached property used by memoize.
+
+    Without a TTL the value is written to the instance __dict__ under the
+    property's own name, so later reads never reach this descriptor. With
+    a TTL (or on __slots__ classes) the descriptor stores (value, expiry)
+    and checks it on each read. The first computation runs under a lock
+    for that instance, so concurrent first readers wait for one result
+    instead of each calling the method while other instances compute in
+    parallel. The locks are kept on the descriptor only while a
+    computation is in flight, so nothing but the cached value is ever
+    stored on the instance.
+    """
+
+    def __init__(self, fn: Callable, ttl: Optional[float] = None) -> None:
+        """Wrap fn, caching its result for ttl seconds (None = forever)."""
+        self.fn = fn
+        self.ttl = ttl
+        self.name = fn.__name__
+        self.slot_name = "_{}".format(fn.__name__)  # storage on slots classes
+        self.__doc__ = fn.__doc__
+        self._registry_lock = threading.Lock()
+        self._in_flight: Dict[int, List] = {}  # id -> [RLock, users]
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        """Use the attribute name the descriptor was assigned to."""
+        self.name = name
+        self.slot_name = "_{}".format(name)
+
+    def _key(self) -> str:
+        """Return the __dict__ key holding (value, expiry) for TTL caches."""
+        return "_memoize_{}".format(self.name)
+
+    def _lookup(self, instance: Any) -> Any:
+        """Return the cached value, or _MISSING if absent or expired."""
+        state = getattr(instance, "__dict__", None)
+        if state is not None and self.ttl is None:
+            return state.get(self.name, _MISSING)
+        if state is not None:
+            cached = state.get(self._key())
+        else:
+            cached = getattr(instance, self.slot_name, None)
+        if cached is None:
+            return _MISSING
+        value, expires_at = cached
+        if expires_at is not None and time.monotonic() >= expires_at:
+            return _MISSING
+        return value
+
+    def _store(self, instance: Any, value: Any) -> None:
+        """Save a freshly computed value on the instance."""
+        state = getattr(instance, "__dict__", None)
+        if state is not None and self.ttl is None:
+            state[self.name] = value
+            return
+        expires_at = (time.monotonic() + self.ttl
+                      if self.ttl is not None else None)
+        if state is not None:
+            state[self._key()] = (value, expires_at)
+            return
+        try:
+            setattr(instance, self.slot_name, (value, expires_at))
+        except AttributeError:
+            raise TypeError(
+                "{} needs a '{}' slot to memoize {}".format(
+                    type(instance).__name__, self.slot_name, self.name)
+            ) from None
+
+    @contextmanager
+    def _instance_lock(self, instance: Any) -> Iterator[None]:
+        """Hold the lock guarding first computation on this instance.
+
+        The id is a safe key: the caller keeps the instance alive for as
+        long as the entry exists, and the last user removes it.
+        """
+        key = id(instance)
+        with self._registry_lock:
+            entry = self._in_flight.setdefault(key, [threading.RLock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._registry_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._in_flight[key]
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> Any:
+        """Return the cached value, computing it once if needed."""
+        if instance is None:
+            return self
+        value = self._lookup(instance)
+        if value is not _MISSING:
+            return value
+        with self._instance_lock(instance):
+            value = self._lookup(instance)  # another thread may have won
+            if value is _MISSING:
+                value = self.fn(instance)
+                self._store(instance, value)
+        return value
+
+    def invalidate(self, instance: Any) -> None:
+        """Drop the cached value so the next read recomputes it."""
+        state = getattr(instance, "__dict__", None)
+        if state is not None:
+            state.pop(self.name, None)
+            state.pop(self._key(), None)
+        elif hasattr(instance, self.slot_name):
+            setattr(instance, self.slot_name, None)
+
+
+def memoize(fn: Optional[Callable] = None, *,
+            ttl: Optional[float] = None) -> Any:
+    """Decorator to memoize a method as a read-only property.
+
+    Usable as @memoize or @memoize(ttl=60). Concurrent first reads run
+    the method once; call invalidate(obj, "name") (or ``del obj.name``
+    for memoized values without a TTL) to force a recompute.
+    Example
+    -------
+    class MyClass:
+        @memoize
+        def a_method(self):
+            print("a_method called")
+            return 42
+    >>> my_object = MyClass()
+    >>> my_object.a_method
+    a_method called
+    42
+    >>> my_object.a_method
+    42
+    """
+    if fn is None:
+        return lambda func: _Memoized(func, ttl)
+    return _Memoized(fn, ttl)
+
+
+def invalidate(instance: Any, name: str) -> None:
+    """Drop the memoized value called name on instance."""
+    getattr(type(instance), name).invalidate(instance)
@@ -0,0 +1,118 @@
+"""
+Compare query counts and wall time of the old level-by-level
+get_descendants walk and the materialized-path range scan, for threads
+10/50/100 deep (100 is Message.MAX_DEPTH). Then compare the old recursive get_thread /
+build_thread_dict against the flat-fetch versions on a bushy thread.
+
+Runs against a throwaway test database: python bench_thread_queries.py
+"""
+import os
+import time
+
+import django
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'messaging.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from messaging.models import Message  # noqa: E402
+from messaging.tests_thread_queries import build_chain  # noqa: E402
+from messaging.thread_utils import build_thread_dict, message_to_dict  # noqa: E402
+
+
+def legacy_get_descendants(message):
+    """The previous implementation: 3-4 queries per level."""
+    result = list(message.replies.all())
+    if result:
+        level = message.replies.all()
+        while level.exists():
+            level_pks = list(level.values_list('pk', flat=True))
+            next_level = Message.objects.filter(parent_message_id__in=level_pks)
+            if next_level.exists():
+                result.extend(next_level)
+            level = next_level
+    return result
+
+
+def legacy_get_thread(message, depth=0, max_depth=10):
+    """The previous Message.get_thread: one query per node."""
+    if depth > max_depth:
+        return None
+    return {
+        'id': message.id,
+        'sender': message.sender.username,
+        'replies': [
+            legacy_get_thread(reply, depth + 1, max_depth)
+            for reply in message.replies.all().select_related('sender', 'receiver')
+        ]
+    }
+
+
+def legacy_build_thread_dict(message, max_depth, current_depth=0):
+    """The previous build_thread_dict: only the first level was prefetched."""
+    if current_depth > max_depth:
+        return None
+    message_dict = message_to_dict(message)
+    for reply in message.replies.all():
+        reply_dict = legacy_build_thread_dict(reply, max_depth, current_depth + 1)
+        if reply_dict:
+            message_dict['replies'].append(reply_dict)
+    return message_dict
+
+
+def build_bushy_thread(sender, receiver, fanout=(20, 5, 3)):
+    """A root with fanout[0] replies, each with fanout[1] replies, ..."""
+    root = Message.objects.create(sender=sender, receiver=receiver, content='root')
+    level = [root]
+    for width in fanout:
+        level = [
+            Message.objects.create(sender=receiver, receiver=sender,
+                                   content='reply', parent_message=parent)
+            for parent in level for _ in range(width)
+        ]
+    return root
+
+
+def measure(func):
+    reset_queries()  # the query log is capped, keep the setup inserts out of it
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+    return len(queries), elapsed * 1000
+
+
+def main():
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        User = get_user_model()
+        sender = User.objects.create_user(username='bench1')
+        receiver = User.objects.create_user(username='bench2')
+        for depth in (10, 50, Message.MAX_DEPTH):
+            root = build_chain(sender, receiver, depth)[0]
+            legacy = measure(lambda: legacy_get_descendants(root))
+            path = measure(lambda: root.get_descendants())
+            print(f'depth {depth:>4}: legacy {legacy[0]:>5} queries {legacy[1]:8.1f} ms'
+                  f' | path {path[0]:>2} queries {path[1]:8.1f} ms')
+        
+        root = build_bushy_thread(sender, receiver)
+        size = Message.objects.in_thread(root.pk).count()
+        prefetched = Message.objects.select_related('sender', 'receiver').prefetch_related(
+            'replies').get(pk=root.pk)
+        for name, legacy, flat in (
+            ('get_thread', lambda: legacy_get_thread(root),
+             lambda: root.get_thread()),
+            ('build_thread_dict', lambda: legacy_build_thread_dict(prefetched, 10),
+             lambda: build_thread_dict(root, 10)),
+        ):
+            legacy, flat = measure(legacy), measure(flat)
+            print(f'{name} ({size} messages): legacy {legacy[0]:>4} queries {legacy[1]:8.1f} ms'
+                  f' | flat {flat[0]:>2} queries {flat[1]:8.1f} ms')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
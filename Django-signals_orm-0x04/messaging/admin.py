@@ -2,7 +2,6 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from django.db.models import Count
 
 from .models import Message, Notification, MessageHistory
 
@@ -83,9 +82,13 @@ class MessageAdmin(admin.ModelAdmin):
     inlines = [MessageInline]
     
     def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            reply_count=Count('replies')
-        )
+        # Thread counters come from the denormalized summary, not a GROUP BY
+        return super().get_queryset(request).select_related('summary')
+    
+    def reply_count(self, obj):
+        summary = getattr(obj, 'summary', None) if obj.parent_message_id is None else None
+        return summary.reply_count if summary else None
+    reply_count.short_description = 'Thread replies'
     
     def view_history(self, obj):
         if obj.edit_history.exists():
@@ -1,5 +1,10 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
 from django.db.models import Q
+from django.utils.http import int_to_base36
+
+from .view_cache import invalidate_on_commit
 
 
 class UnreadMessagesManager(models.Manager):
@@ -21,7 +26,8 @@ class UnreadMessagesManager(models.Manager):
             receiver=user,
             is_read=False
         ).only(
-            'id', 'content', 'timestamp', 'sender_id', 'receiver_id', 'parent_message_id'
+            'id', 'content', 'timestamp', 'sender_id', 'receiver_id', 'parent_message_id',
+            'thread_root_id'
         )
     
     def unread_count(self, user):
@@ -29,12 +35,33 @@ class UnreadMessagesManager(models.Manager):
         return self.unread_for_user(user).count()
     
     def mark_as_read(self, message_ids, user):
-        """Mark specific messages as read for a user."""
-        return self.filter(
-            id__in=message_ids,
-            receiver=user,
-            is_read=False
-        ).update(is_read=True)
+        """
+        Mark specific messages as read for a user, and lower the user's
+        unread counts on the affected threads in the same transaction.
+        Cached thread views of those threads are invalidated on commit.
+        """
+        from .models import ThreadParticipant
+        
+        with transaction.atomic():
+            unread = list(
+                self.model.objects.select_for_update().filter(
+                    id__in=message_ids, receiver=user, is_read=False
+                ).values_list('id', 'thread_root_id')
+            )
+            if not unread:
+                return 0
+            updated = self.model.objects.filter(
+                id__in=[pk for pk, _ in unread], is_read=False
+            ).update(is_read=True)
+            threads = Counter(root_id for _, root_id in unread)
+            for thread_id, count in threads.items():
+                ThreadParticipant.add_unread(thread_id, user.pk, -count)
+            # Read flags and unread counts changed for everyone in these threads
+            invalidate_on_commit(
+                ThreadParticipant.objects.filter(thread_id__in=threads)
+                                         .values_list('user_id', flat=True)
+            )
+            return updated
 
 
 class MessageQuerySet(models.QuerySet):
@@ -49,5 +76,37 @@ class MessageQuerySet(models.QuerySet):
         return self.filter(Q(sender=user) | Q(receiver=user))
     
     def in_thread(self, thread_id):
-        """Filter messages in a specific thread."""
-        return self.filter(Q(pk=thread_id) | Q(parent_message_id=thread_id))
+        """Filter all messages in a specific thread, at any depth."""
+        return self.filter(thread_root_id=thread_id)
+    
+    def subtree_of(self, path):
+        """
+        Filter a message (given its path) and everything below it.
+        Written as a range rather than startswith so it stays an index
+        range scan: descendants sort at or after the path and before the
+        next path of the same length (the path plus one, in base 36).
+        Paths only hold digits and lowercase letters, so this ordering
+        holds under any collation.
+        """
+        upper = int(path, 36) + 1
+        if upper >= 36 ** len(path):  # all 'z': nothing sorts after it
+            return self.filter(path__gte=path)
+        return self.filter(path__gte=path, path__lt=int_to_base36(upper).zfill(len(path)))
+    
+    def thread_of(self, message, max_depth=None):
+        """
+        A message and everything below it, down to max_depth levels, in one
+        query. Ordered parents-first (depth, timestamp, id) with sender and
+        receiver joined in, ready for thread_utils.build_tree.
+        """
+        messages = self.subtree_of(message.path)
+        if max_depth is not None:
+            messages = messages.filter(depth__lte=message.depth + max_depth)
+        return messages.select_related('sender', 'receiver').order_by('depth', 'timestamp', 'id')
+    
+    def threads_of(self, root_ids, max_depth=None):
+        """Like thread_of, for several whole threads given their root ids."""
+        messages = self.filter(thread_root_id__in=root_ids)
+        if max_depth is not None:
+            messages = messages.filter(depth__lte=max_depth)
+        return messages.select_related('sender', 'receiver').order_by('depth', 'timestamp', 'id')
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, help_text='Number of replies between the root and this message.'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='path',
+            field=models.TextField(blank=True, default='', help_text='Materialized path of zero-padded ids from the root to this message.'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='thread_root',
+            field=models.ForeignKey(blank=True, help_text='Root message of the thread (itself for a root message).', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_messages', to='messaging.message'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['thread_root', 'timestamp'], name='messaging_m_thread__3ff12b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['path'], name='messaging_m_path_5a4ed8_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, transaction
+from django.db.models import Q
+
+BATCH_SIZE = 1000
+PATH_STEP = 10  # Message.PATH_STEP at the time of writing
+
+
+def backfill_thread_paths(apps, schema_editor):
+    """
+    Fill thread_root, path and depth for existing messages.
+    
+    Roots are done first, then every message whose parent is already
+    filled in, so each pass only needs its parent's values. Each batch
+    commits on its own to keep locks short on large tables.
+    """
+    Message = apps.get_model('messaging', 'Message')
+    messages = Message.objects.using(schema_editor.connection.alias)
+    pending = messages.filter(path='').filter(
+        Q(parent_message__isnull=True) | ~Q(parent_message__path='')
+    ).order_by('pk')
+    while True:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            rows = list(pending.values_list(
+                'pk', 'parent_message_id', 'parent_message__path',
+                'parent_message__depth', 'parent_message__thread_root_id'
+            )[:BATCH_SIZE])
+            if not rows:
+                return
+            batch = []
+            for pk, parent_id, parent_path, parent_depth, parent_root_id in rows:
+                if parent_id is None:
+                    batch.append(Message(pk=pk, path=f'{pk:0{PATH_STEP}d}/', depth=0,
+                                         thread_root_id=pk))
+                else:
+                    batch.append(Message(pk=pk, path=f'{parent_path}{pk:0{PATH_STEP}d}/',
+                                         depth=parent_depth + 1,
+                                         thread_root_id=parent_root_id))
+            messages.bulk_update(batch, ['path', 'depth', 'thread_root'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('messaging', '0002_thread_root_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_thread_paths, migrations.RunPython.noop),
+    ]
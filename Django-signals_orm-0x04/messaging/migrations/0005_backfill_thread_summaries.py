@@ -0,0 +1,66 @@
+from django.db import migrations, transaction
+from django.db.models import Count, Max
+
+BATCH_SIZE = 1000
+
+
+def backfill_thread_summaries(apps, schema_editor):
+    """
+    Create a summary and participant rows for every existing thread,
+    BATCH_SIZE root messages at a time, each batch in its own transaction.
+    """
+    Message = apps.get_model('messaging', 'Message')
+    ThreadSummary = apps.get_model('messaging', 'ThreadSummary')
+    ThreadParticipant = apps.get_model('messaging', 'ThreadParticipant')
+    alias = schema_editor.connection.alias
+    root_ids = (
+        Message.objects.using(alias)
+        .filter(parent_message__isnull=True)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+    last_id = 0
+    while True:
+        batch = list(root_ids.filter(pk__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return
+        last_id = batch[-1]
+        with transaction.atomic(using=alias):
+            messages = Message.objects.using(alias).filter(thread_root_id__in=batch)
+            replies = {
+                row['thread_root_id']: row
+                for row in messages.exclude(pk__in=batch).values('thread_root_id')
+                                   .annotate(count=Count('pk'), last=Max('timestamp'))
+            }
+            ThreadSummary.objects.using(alias).bulk_create([
+                ThreadSummary(
+                    root_id=root_id,
+                    reply_count=replies.get(root_id, {}).get('count', 0),
+                    last_reply_at=replies.get(root_id, {}).get('last'),
+                )
+                for root_id in batch
+            ])
+            unread = {
+                (row['thread_root_id'], row['receiver_id']): row['count']
+                for row in messages.filter(is_read=False).values('thread_root_id', 'receiver_id')
+                                   .annotate(count=Count('pk'))
+            }
+            pairs = set(messages.values_list('thread_root_id', 'sender_id'))
+            pairs |= set(messages.values_list('thread_root_id', 'receiver_id'))
+            ThreadParticipant.objects.using(alias).bulk_create([
+                ThreadParticipant(thread_id=root_id, user_id=user_id,
+                                  unread_count=unread.get((root_id, user_id), 0))
+                for root_id, user_id in pairs
+            ])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('messaging', '0004_thread_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_thread_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations, models, transaction
+from django.utils.http import int_to_base36
+
+BATCH_SIZE = 1000
+PATH_STEP = 7  # Message.PATH_STEP at the time of writing
+MAX_DEPTH = 100  # Message.MAX_DEPTH at the time of writing
+
+
+def compact_path(old_path):
+    """Rewrite a '0000000042/0000000043/' path as fixed-width base-36 segments."""
+    return ''.join(
+        int_to_base36(int(segment)).zfill(PATH_STEP) for segment in old_path.split('/') if segment
+    )
+
+
+def compact_thread_paths(apps, schema_editor):
+    """
+    Re-encode every path, BATCH_SIZE messages at a time, each batch in its
+    own transaction. Fails if a thread is deeper than MAX_DEPTH, since its
+    path would not fit the new column.
+    """
+    Message = apps.get_model('messaging', 'Message')
+    alias = schema_editor.connection.alias
+    messages = Message.objects.using(alias).exclude(path='').order_by('pk')
+    last_id = 0
+    while True:
+        with transaction.atomic(using=alias):
+            rows = list(messages.filter(pk__gt=last_id).values_list('pk', 'path', 'depth')[:BATCH_SIZE])
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            batch = []
+            for pk, path, depth in rows:
+                if depth > MAX_DEPTH:
+                    raise ValueError(
+                        f'Message {pk} is {depth} levels deep; the limit is {MAX_DEPTH}.'
+                    )
+                if '/' in path:
+                    batch.append(Message(pk=pk, path=compact_path(path)))
+            Message.objects.using(alias).bulk_update(batch, ['path'])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('messaging', '0005_backfill_thread_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_thread_paths, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='message',
+            name='path',
+            field=models.CharField(blank=True, default='', help_text='Materialized path of fixed-width base-36 ids from the root to this message.', max_length=707),
+        ),
+    ]
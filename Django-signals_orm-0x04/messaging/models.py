@@ -1,11 +1,22 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Count, F, Max, Q, Value
+from django.db.models.functions import Concat, Substr
+from django.utils.http import int_to_base36
 
 # Import managers from managers.py
 from .managers import UnreadMessagesManager, MessageQuerySet
 
+# Marks a field value that wasn't loaded from the database (deferred)
+NOT_LOADED = object()
+
+# Each message adds one fixed-width base-36 id segment to `path`. Digits
+# and lowercase letters sort the same way under every collation, and the
+# depth cap keeps the column short enough to index on MySQL and Postgres.
+PATH_STEP = 7
+MAX_DEPTH = 100
+
 class Message(models.Model):
     """
     Model representing a message between users.
@@ -32,6 +43,24 @@ class Message(models.Model):
         related_name='replies',
         help_text='Reference to the message this is a reply to, if any.'
     )
+    thread_root = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='thread_messages',
+        help_text='Root message of the thread (itself for a root message).'
+    )
+    path = models.CharField(
+        max_length=PATH_STEP * (MAX_DEPTH + 1),
+        blank=True,
+        default='',
+        help_text='Materialized path of fixed-width base-36 ids from the root to this message.'
+    )
+    depth = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of replies between the root and this message.'
+    )
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     edited = models.BooleanField(default=False)
@@ -48,86 +77,301 @@ class Message(models.Model):
             models.Index(fields=['sender', 'receiver']),
             models.Index(fields=['parent_message']),  # For filtering replies
             models.Index(fields=['thread_updated']),  # For sorting threads
+            models.Index(fields=['thread_root', 'timestamp']),  # Whole-thread scans
+            models.Index(fields=['path']),  # Subtree range scans
         ]
-        
+    
+    # Width of each id segment in `path`, so paths sort like the tree
+    PATH_STEP = PATH_STEP
+    # Deepest reply allowed below a root, so `path` fits its column
+    MAX_DEPTH = MAX_DEPTH
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded parent and root so save() can tell when a message moves."""
+        instance = super().from_db(db, field_names, values)
+        # Deferred fields (e.g. loaded through only()) are remembered as
+        # NOT_LOADED, so save() doesn't mistake them for changes
+        loaded = dict(zip(field_names, values))
+        instance._loaded_parent_id = loaded.get('parent_message_id', NOT_LOADED)
+        instance._loaded_thread_root_id = loaded.get('thread_root_id', NOT_LOADED)
+        return instance
+    
+    @classmethod
+    def make_path(cls, parent_path, pk):
+        """Path of a message with the given id under a parent path."""
+        segment = int_to_base36(pk)
+        if len(segment) > cls.PATH_STEP:
+            raise ValueError(f'Message id {pk} does not fit in a path segment.')
+        return parent_path + segment.zfill(cls.PATH_STEP)
+    
     def save(self, *args, **kwargs):
-        """Override save to update thread_updated on parent message when replying."""
-        if self.parent_message:
-            # Update the parent's thread_updated when a new reply is added
-            Message.objects.filter(pk=self.parent_message.pk).update(
+        """
+        Override save to keep thread_root, path and depth in sync with
+        parent_message, update thread_updated on the parent and root
+        message when replying, and keep the thread's summary counters
+        current. Everything happens in one transaction.
+        """
+        with transaction.atomic():
+            self._save_in_thread(*args, **kwargs)
+    
+    def _save_in_thread(self, *args, **kwargs):
+        creating = self._state.adding
+        parent = self.parent_message if self.parent_message_id else None
+        old_path, old_depth, old_root_id = self.path, self.depth, self.thread_root_id
+        if parent:
+            self.thread_root_id = parent.thread_root_id or parent.pk
+            self.depth = parent.depth + 1
+            if not creating and old_path and parent.path.startswith(old_path):
+                raise ValueError('A message cannot be moved under its own reply.')
+            if self.depth > self.MAX_DEPTH:
+                raise ValueError(f'Replies cannot be nested more than {self.MAX_DEPTH} levels deep.')
+            # Update the parent's and root's thread_updated when a new reply is added
+            Message.objects.filter(pk__in={parent.pk, self.thread_root_id}).update(
                 thread_updated=timezone.now()
             )
+        else:
+            self.thread_root_id = self.pk
+            self.depth = 0
+        read_change = None
+        if not creating:
+            self.path = self.make_path(parent.path if parent else '', self.pk)
+            read_change = self._lock_read_change(kwargs.get('update_fields'))
         super().save(*args, **kwargs)
         
+        if creating:
+            # The path ends with our own id, which only exists after the insert
+            self.path = self.make_path(parent.path if parent else '', self.pk)
+            self.thread_root_id = self.thread_root_id or self.pk
+            Message.objects.filter(pk=self.pk).update(
+                path=self.path, thread_root_id=self.thread_root_id
+            )
+            ThreadSummary.record_new_message(self)
+        else:
+            rebuilt = False
+            if old_path and old_path != self.path:
+                # Moved to another parent: re-root the whole subtree in one UPDATE
+                subtree = Message.objects.subtree_of(old_path).exclude(pk=self.pk)
+                deepest = subtree.aggregate(deepest=Max('depth'))['deepest']
+                if deepest is not None and deepest + self.depth - old_depth > self.MAX_DEPTH:
+                    raise ValueError(f'Replies cannot be nested more than {self.MAX_DEPTH} levels deep.')
+                subtree.update(
+                    path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (self.depth - old_depth),
+                    thread_root_id=self.thread_root_id,
+                )
+                if old_root_id != self.thread_root_id:
+                    # Recounts both threads, read state included
+                    ThreadSummary.rebuild([old_root_id, self.thread_root_id, self.pk])
+                    rebuilt = True
+            if not rebuilt and read_change is not None:
+                ThreadParticipant.add_unread(
+                    read_change['thread_root_id'], read_change['receiver_id'],
+                    -1 if self.is_read else 1
+                )
+        self._loaded_parent_id = self.parent_message_id
+        self._loaded_thread_root_id = self.thread_root_id
+    
+    def _lock_read_change(self, update_fields):
+        """
+        Lock this message's row (as mark_as_read does) and return its
+        stored is_read, thread_root_id and receiver_id if this save flips
+        is_read, else None. The comparison is against the row, not the
+        value loaded earlier, so a stale instance never counts a read
+        twice. Saves that don't write is_read (deferred, or left out of
+        update_fields) never touch the counters.
+        """
+        if 'is_read' not in self.__dict__:
+            return None
+        if update_fields is not None and 'is_read' not in update_fields:
+            return None
+        current = (
+            Message.objects.select_for_update().filter(pk=self.pk)
+                           .values('is_read', 'thread_root_id', 'receiver_id').first()
+        )
+        if current is None or current['is_read'] == self.is_read:
+            return None
+        return current
+        
     def get_thread(self, depth=0, max_depth=10):
         """
-        Recursively fetch the entire thread of messages.
+        Fetch the entire thread of messages below this one.
+        
+        All messages are loaded in a single query (the depth cutoff is
+        applied in SQL) and linked into nested dicts in one pass.
         
         Args:
-            depth: Current recursion depth (used internally)
-            max_depth: Maximum depth to prevent infinite recursion
+            depth: Depth this message counts as (replies start at depth + 1)
+            max_depth: Maximum depth of nested replies to include
             
         Returns:
             dict: Message with nested replies
         """
+        from .thread_utils import build_tree
+        
         if depth > max_depth:
             return None
-            
-        return {
-            'id': self.id,
-            'sender': self.sender.username,
-            'receiver': self.receiver.username,
-            'content': self.content,
-            'timestamp': self.timestamp.isoformat(),
-            'edited': self.edited,
-            'is_read': self.is_read,
-            'replies': [
-                reply.get_thread(depth + 1, max_depth)
-                for reply in self.replies.all().select_related('sender', 'receiver')
-            ]
-        }
+        
+        nodes = build_tree(
+            Message.objects.thread_of(self, max_depth - depth),
+            lambda message: {
+                'id': message.id,
+                'sender': message.sender.username,
+                'receiver': message.receiver.username,
+                'content': message.content,
+                'timestamp': message.timestamp.isoformat(),
+                'edited': message.edited,
+                'is_read': message.is_read,
+                'replies': []
+            }
+        )
+        return nodes[self.id]
 
     def get_root(self):
         """
         Get the root message of the thread.
-        Uses iterative approach to avoid recursion depth issues.
+        Uses the denormalized thread_root, so it costs at most one query.
         """
+        if self.thread_root_id and self.thread_root_id != self.pk:
+            return self.thread_root
         current = self
-        while current.parent_message:
+        while current.thread_root_id is None and current.parent_message_id:
+            # Unsaved reply: fall back to walking up the parents
             current = current.parent_message
+        if current.thread_root_id and current.thread_root_id != current.pk:
+            return current.thread_root
         return current
     
-    def get_descendants(self, include_self=False):
+    def get_descendants(self, include_self=False, max_depth=None):
         """
         Get all descendant messages of this message.
-        Uses a non-recursive approach to avoid recursion depth issues.
+        A single index range scan on the materialized path, ordered
+        breadth-first, with sender and receiver already loaded.
         """
-        from django.db.models import Q
-        
-        # Start with direct replies
-        descendants = list(self.replies.all())
-        if include_self:
-            result = [self] + descendants
-        else:
-            result = descendants
-        
-        # Get all nested replies using a single query
-        if descendants:
-            # Get all replies to these messages
-            level = self.replies.all()
-            while level.exists():
-                level_pks = list(level.values_list('pk', flat=True))
-                next_level = Message.objects.filter(parent_message_id__in=level_pks)
-                if next_level.exists():
-                    result.extend(next_level)
-                level = next_level
-        
-        return result
+        descendants = Message.objects.thread_of(self, max_depth)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return list(descendants)
     
     def __str__(self):
         return f'Message from {self.sender} to {self.receiver} at {self.timestamp}'
 
 
+class ThreadSummary(models.Model):
+    """
+    Denormalized counters for one thread, keyed by its root message.
+    Maintained by Message.save and UnreadMessagesManager.mark_as_read.
+    """
+    root = models.OneToOneField(
+        Message,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary'
+    )
+    reply_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of messages in the thread besides the root.'
+    )
+    last_reply_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'Thread summaries'
+
+    @classmethod
+    def record_new_message(cls, message):
+        """Count a just-inserted message in its thread's summary."""
+        if message.thread_root_id == message.pk:
+            cls.objects.create(root=message)
+        else:
+            cls.objects.filter(pk=message.thread_root_id).update(
+                reply_count=F('reply_count') + 1,
+                last_reply_at=message.timestamp
+            )
+        ThreadParticipant.objects.bulk_create(
+            [
+                ThreadParticipant(thread_id=message.thread_root_id, user_id=user_id)
+                for user_id in {message.sender_id, message.receiver_id}
+            ],
+            ignore_conflicts=True
+        )
+        if not message.is_read:
+            ThreadParticipant.add_unread(message.thread_root_id, message.receiver_id, 1)
+
+    @classmethod
+    def rebuild(cls, root_ids):
+        """
+        Recompute the summaries and participants of the given threads from
+        their messages. Ids that are no longer roots lose their summary.
+        """
+        root_ids = set(root_ids) - {None}
+        roots = set(
+            Message.objects.filter(pk__in=root_ids, parent_message__isnull=True)
+                           .values_list('pk', flat=True)
+        )
+        cls.objects.filter(pk__in=root_ids - roots).delete()
+        ThreadParticipant.objects.filter(thread_id__in=roots).delete()
+        messages = Message.objects.filter(thread_root_id__in=roots)
+        replies = {
+            row['thread_root_id']: row
+            for row in messages.exclude(pk__in=roots).values('thread_root_id')
+                               .annotate(count=Count('pk'), last=Max('timestamp'))
+        }
+        for root_id in roots:
+            row = replies.get(root_id, {})
+            cls.objects.update_or_create(root_id=root_id, defaults={
+                'reply_count': row.get('count', 0),
+                'last_reply_at': row.get('last'),
+            })
+        unread = {
+            (row['thread_root_id'], row['receiver_id']): row['count']
+            for row in messages.filter(is_read=False).values('thread_root_id', 'receiver_id')
+                               .annotate(count=Count('pk'))
+        }
+        pairs = set(messages.values_list('thread_root_id', 'sender_id'))
+        pairs |= set(messages.values_list('thread_root_id', 'receiver_id'))
+        ThreadParticipant.objects.bulk_create([
+            ThreadParticipant(thread_id=root_id, user_id=user_id,
+                              unread_count=unread.get((root_id, user_id), 0))
+            for root_id, user_id in pairs
+        ])
+
+    def __str__(self):
+        return f'Summary of thread {self.root_id}'
+
+
+class ThreadParticipant(models.Model):
+    """
+    A user taking part in a thread, with their unread message count.
+    One row per (user, thread), so a user's thread list is one index scan.
+    """
+    thread = models.ForeignKey(
+        ThreadSummary,
+        on_delete=models.CASCADE,
+        related_name='participants'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='thread_participations'
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'thread'], name='unique_thread_participant'),
+        ]
+
+    @classmethod
+    def add_unread(cls, thread_id, user_id, delta):
+        """Adjust a participant's unread count in place."""
+        return cls.objects.filter(thread_id=thread_id, user_id=user_id).update(
+            unread_count=F('unread_count') + delta
+        )
+
+    def __str__(self):
+        return f'{self.user} in thread {self.thread_id}'
+
+
 class Notification(models.Model):
     """
     Model representing a notification for a user about a new message.
@@ -39,3 +39,7 @@ CACHES = {
 
 # Cache timeout in seconds
 CACHE_MIDDLEWARE_SECONDS = 60
+
+# Per-user thread view cache: entries are invalidated when the user's data
+# changes, so they can live much longer than a plain time-based cache
+MESSAGING_VIEW_CACHE_TIMEOUT = 60 * 60 * 6
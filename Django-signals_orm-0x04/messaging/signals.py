@@ -2,7 +2,11 @@ from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from .models import Message, Notification, MessageHistory
+from django.db.models import F, Max
+from .models import (
+    NOT_LOADED, Message, Notification, MessageHistory, ThreadParticipant, ThreadSummary
+)
+from .view_cache import invalidate_on_commit
 
 User = get_user_model()
 
@@ -45,6 +49,66 @@ def track_message_edits(sender, instance, **kwargs):
         pass
 
 
+@receiver(post_delete, sender=Message)
+def update_thread_summary_on_delete(sender, instance, **kwargs):
+    """
+    Signal receiver that takes a deleted reply out of its thread's counters
+    and recomputes last_reply_at from the replies that are left.
+    Deleting a root removes its summary through the cascade instead.
+    """
+    root_id = instance.thread_root_id
+    if root_id in (None, instance.pk):
+        return
+    last_reply_at = (
+        Message.objects.filter(thread_root_id=root_id).exclude(pk=root_id)
+                       .aggregate(last=Max('timestamp'))['last']
+    )
+    ThreadSummary.objects.filter(pk=root_id).update(
+        reply_count=F('reply_count') - 1, last_reply_at=last_reply_at
+    )
+    if not instance.is_read:
+        ThreadParticipant.add_unread(instance.thread_root_id, instance.receiver_id, -1)
+
+
+def thread_user_ids(*root_ids):
+    """Ids of every participant of the given threads."""
+    return list(
+        ThreadParticipant.objects.filter(thread_id__in=root_ids).values_list('user_id', flat=True)
+    )
+
+
+@receiver(pre_save, sender=Message)
+def invalidate_previous_thread_views(sender, instance, **kwargs):
+    """
+    Signal receiver that invalidates the cached views of everyone in the
+    thread a message is being moved out of.
+    """
+    old_root_id = getattr(instance, '_loaded_thread_root_id', NOT_LOADED)
+    if old_root_id is NOT_LOADED:
+        return
+    if instance.pk and old_root_id and old_root_id != instance.thread_root_id:
+        invalidate_on_commit(thread_user_ids(old_root_id))
+
+
+@receiver(post_save, sender=Message)
+def invalidate_thread_views(sender, instance, **kwargs):
+    """
+    Signal receiver that invalidates the cached thread views of the sender,
+    the receiver and everyone else in the message's thread.
+    """
+    invalidate_on_commit(
+        [instance.sender_id, instance.receiver_id, *thread_user_ids(instance.thread_root_id)]
+    )
+
+
+@receiver(post_delete, sender=Message)
+def invalidate_thread_views_on_delete(sender, instance, **kwargs):
+    """Signal receiver that invalidates cached views showing a deleted message."""
+    invalidate_on_commit(
+        [instance.sender_id, instance.receiver_id, *thread_user_ids(instance.thread_root_id)]
+    )
+
+
 def ready(self):
     """Import signals to ensure they are registered when the app is ready.
     
@@ -0,0 +1,236 @@
+import importlib
+import json
+
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.contrib.auth import get_user_model
+from django.utils.http import int_to_base36
+
+from .models import Message
+from .thread_utils import build_thread_dict
+from . import views
+
+User = get_user_model()
+
+
+def segment(message):
+    """The fixed-width base-36 path segment of a message."""
+    return int_to_base36(message.pk).zfill(Message.PATH_STEP)
+
+
+def build_chain(sender, receiver, depth, root=None):
+    """Create a thread where every message replies to the previous one."""
+    current = root or Message.objects.create(
+        sender=sender, receiver=receiver, content='root'
+    )
+    chain = [current]
+    for i in range(depth):
+        current = Message.objects.create(
+            sender=receiver if i % 2 == 0 else sender,
+            receiver=sender if i % 2 == 0 else receiver,
+            content=f'reply {i}',
+            parent_message=current
+        )
+        chain.append(current)
+    return chain
+
+
+class SubtreeLoaderTests(TestCase):
+    def setUp(self):
+        cache.clear()  # thread_list_api responses are cached by URL
+        self.user1 = User.objects.create_user(username='user1', password='testpass123')
+        self.user2 = User.objects.create_user(username='user2', password='testpass123')
+        
+        # root -> (a -> a1, b)
+        self.root = Message.objects.create(
+            sender=self.user1, receiver=self.user2, content='root'
+        )
+        self.a = Message.objects.create(
+            sender=self.user2, receiver=self.user1, content='a', parent_message=self.root
+        )
+        self.b = Message.objects.create(
+            sender=self.user2, receiver=self.user1, content='b', parent_message=self.root
+        )
+        self.a1 = Message.objects.create(
+            sender=self.user1, receiver=self.user2, content='a1', parent_message=self.a
+        )
+        Message.objects.create(sender=self.user1, receiver=self.user2, content='unrelated')
+    
+    def test_descendants_breadth_first_with_depth(self):
+        """Descendants come back level by level with their depth."""
+        descendants = self.root.get_descendants()
+        self.assertEqual(
+            [(m.pk, m.depth) for m in descendants],
+            [(self.a.pk, 1), (self.b.pk, 1), (self.a1.pk, 2)]
+        )
+    
+    def test_include_self(self):
+        """include_self puts the starting message first."""
+        descendants = self.a.get_descendants(include_self=True)
+        self.assertEqual([(m.pk, m.depth) for m in descendants], [(self.a.pk, 1), (self.a1.pk, 2)])
+    
+    def test_max_depth_is_applied_in_sql(self):
+        """max_depth cuts the recursion off."""
+        descendants = self.root.get_descendants(max_depth=1)
+        self.assertEqual({m.pk for m in descendants}, {self.a.pk, self.b.pk})
+    
+    def test_users_are_loaded_in_one_query(self):
+        """Sender and receiver are loaded in the same query."""
+        with self.assertNumQueries(1):
+            descendants = self.root.get_descendants(include_self=True)
+            usernames = {(m.sender.username, m.receiver.username) for m in descendants}
+        self.assertEqual(usernames, {('user1', 'user2'), ('user2', 'user1')})
+    
+    def test_thread_api_returns_every_level(self):
+        """The thread API includes replies below the first level."""
+        request = RequestFactory().get('/api/threads/')
+        request.user = self.user1
+        response = views.thread_list_api(
+            request, other_user_id=self.user2.pk, message_id=self.root.pk
+        )
+        ids = [m['id'] for m in json.loads(response.content)['thread']['messages']]
+        self.assertEqual(ids, [self.root.pk, self.a.pk, self.b.pk, self.a1.pk])
+
+
+class ThreadPathTests(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='testpass123')
+        self.user2 = User.objects.create_user(username='user2', password='testpass123')
+        self.root, self.a, self.a1, self.a2 = build_chain(self.user1, self.user2, 3)
+        self.other = Message.objects.create(
+            sender=self.user1, receiver=self.user2, content='other root'
+        )
+    
+    def test_fields_are_maintained_on_create(self):
+        """thread_root, path and depth are set when a message is saved."""
+        self.assertEqual(self.root.thread_root_id, self.root.pk)
+        self.assertEqual(self.root.path, segment(self.root))
+        self.assertEqual(self.a1.path, segment(self.root) + segment(self.a) + segment(self.a1))
+        self.assertEqual(self.a1.depth, 2)
+        stored = Message.objects.get(pk=self.a2.pk)
+        self.assertEqual((stored.thread_root_id, stored.depth, stored.path),
+                         (self.root.pk, 3, self.a2.path))
+    
+    def test_get_root_is_a_single_lookup(self):
+        message = Message.objects.get(pk=self.a2.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(message.get_root(), self.root)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.root.get_root(), self.root)
+    
+    def test_in_thread_includes_every_level(self):
+        self.assertEqual(
+            set(Message.objects.in_thread(self.root.pk).values_list('pk', flat=True)),
+            {self.root.pk, self.a.pk, self.a1.pk, self.a2.pk}
+        )
+    
+    def test_moving_a_message_moves_its_subtree(self):
+        """Reparenting rewrites the paths, depths and roots below it."""
+        self.a1.parent_message = self.other
+        self.a1.save()
+        moved = Message.objects.get(pk=self.a2.pk)
+        self.assertEqual(moved.thread_root_id, self.other.pk)
+        self.assertEqual(moved.depth, 2)
+        self.assertEqual(moved.path, segment(self.other) + segment(self.a1) + segment(self.a2))
+        self.assertEqual([m.pk for m in self.a.get_descendants()], [])
+    
+    def test_cannot_move_under_own_reply(self):
+        self.a.parent_message = self.a2
+        with self.assertRaises(ValueError):
+            self.a.save()
+    
+    def test_cannot_nest_deeper_than_max_depth(self):
+        chain = build_chain(self.user1, self.user2, Message.MAX_DEPTH)
+        self.assertEqual(len(chain[-1].path), Message._meta.get_field('path').max_length)
+        with self.assertRaises(ValueError):
+            Message.objects.create(sender=self.user1, receiver=self.user2,
+                                   content='too deep', parent_message=chain[-1])
+        # a1 itself fits one level up, but its reply a2 would not
+        self.a1.parent_message = chain[-2]
+        with self.assertRaises(ValueError):
+            self.a1.save()
+        self.assertEqual(Message.objects.get(pk=self.a2.pk).depth, 3)
+    
+    def test_subtree_range_stops_at_the_next_path(self):
+        """A path ending in 'z' still excludes the id right after it."""
+        Message.objects.filter(pk=self.root.pk).update(path='000000z')
+        Message.objects.filter(pk=self.a.pk).update(path='000000z0000001')
+        Message.objects.filter(pk=self.other.pk).update(path='0000010')
+        self.assertEqual(
+            set(Message.objects.subtree_of('000000z').values_list('pk', flat=True)),
+            {self.root.pk, self.a.pk}
+        )
+    
+    def test_backfill_migration(self):
+        """The data migrations rebuild the denormalized fields from parents."""
+        expected = {m.pk: (m.thread_root_id, m.path, m.depth) for m in Message.objects.all()}
+        Message.objects.update(thread_root=None, path='', depth=0)
+        for name, function in (('0003_backfill_thread_paths', 'backfill_thread_paths'),
+                               ('0006_compact_thread_paths', 'compact_thread_paths')):
+            migration = importlib.import_module(f'messaging.migrations.{name}')
+            getattr(migration, function)(django_apps, connection.schema_editor())
+        self.assertEqual(
+            {m.pk: (m.thread_root_id, m.path, m.depth) for m in Message.objects.all()},
+            expected
+        )
+
+
+class ThreadTreeTests(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='user1', password='testpass123')
+        self.user2 = User.objects.create_user(username='user2', password='testpass123')
+        # root -> (chain of 12 replies, side reply)
+        self.chain = build_chain(self.user1, self.user2, 12)
+        self.root = self.chain[0]
+        self.side = Message.objects.create(
+            sender=self.user2, receiver=self.user1, content='side', parent_message=self.root
+        )
+    
+    def ids_by_level(self, node):
+        levels, level = [], [node]
+        while level:
+            levels.append([n['id'] for n in level])
+            level = [reply for n in level for reply in n['replies']]
+        return levels
+    
+    def test_get_thread_is_one_query(self):
+        with self.assertNumQueries(1):
+            thread = self.root.get_thread()
+        levels = self.ids_by_level(thread)
+        self.assertEqual(levels[1], [self.chain[1].pk, self.side.pk])
+        self.assertEqual(len(levels), 11)  # root + max_depth levels of replies
+        self.assertEqual(thread['sender'], 'user1')
+    
+    def test_build_thread_dict_is_one_query_at_any_depth(self):
+        with self.assertNumQueries(1):
+            thread = build_thread_dict(self.root, max_depth=20)
+        self.assertEqual(len(self.ids_by_level(thread)), 13)
+        self.assertEqual(thread['replies'][0]['replies'][0]['sender']['username'], 'user1')
+    
+    def test_depth_cutoff_is_relative_to_the_message(self):
+        thread = build_thread_dict(self.chain[5], max_depth=3)
+        self.assertEqual(self.ids_by_level(thread), [[m.pk] for m in self.chain[5:9]])
+        self.assertIsNone(build_thread_dict(self.root, max_depth=2, current_depth=3))
+
+
+class DeepThreadQueryCountTests(TestCase):
+    """Query counts for loading threads 10, 50 and MAX_DEPTH levels deep."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create_user(username='user1', password='testpass123')
+        cls.user2 = User.objects.create_user(username='user2', password='testpass123')
+        cls.chain = build_chain(cls.user1, cls.user2, Message.MAX_DEPTH)
+    
+    def test_query_count_does_not_grow_with_depth(self):
+        for depth in (10, 50, Message.MAX_DEPTH):
+            with self.subTest(depth=depth):
+                # a chain `depth` levels deep ending at the bottom of the thread
+                start = self.chain[-1 - depth]
+                with self.assertNumQueries(1):
+                    descendants = start.get_descendants()
+                    [m.sender.username for m in descendants]
+                self.assertEqual(len(descendants), depth)
+                self.assertEqual(descendants[-1].depth - start.depth, depth)
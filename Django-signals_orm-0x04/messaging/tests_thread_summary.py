@@ -0,0 +1,149 @@
+import importlib
+import json
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, RequestFactory
+
+from .models import Message, ThreadParticipant, ThreadSummary
+from . import views
+
+User = get_user_model()
+
+
+class ThreadSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='user1', password='testpass123')
+        self.user2 = User.objects.create_user(username='user2', password='testpass123')
+        self.user3 = User.objects.create_user(username='user3', password='testpass123')
+        self.root = Message.objects.create(
+            sender=self.user1, receiver=self.user2, content='root'
+        )
+        self.reply = Message.objects.create(
+            sender=self.user2, receiver=self.user1, content='reply', parent_message=self.root
+        )
+        self.nested = Message.objects.create(
+            sender=self.user3, receiver=self.user1, content='nested', parent_message=self.reply
+        )
+    
+    def unread(self, user, root=None):
+        return ThreadParticipant.objects.get(thread_id=(root or self.root).pk, user=user).unread_count
+    
+    def snapshot(self):
+        summaries = {s.pk: (s.reply_count, s.last_reply_at) for s in ThreadSummary.objects.all()}
+        participants = {
+            (p.thread_id, p.user_id): p.unread_count for p in ThreadParticipant.objects.all()
+        }
+        return summaries, participants
+    
+    def test_counters_follow_new_messages(self):
+        summary = ThreadSummary.objects.get(pk=self.root.pk)
+        self.assertEqual(summary.reply_count, 2)
+        self.assertEqual(summary.last_reply_at, self.nested.timestamp)
+        self.assertEqual(self.unread(self.user1), 2)
+        self.assertEqual(self.unread(self.user2), 1)
+        self.assertEqual(self.unread(self.user3), 0)
+    
+    def test_mark_as_read_lowers_unread_count(self):
+        updated = Message.unread.mark_as_read([self.reply.pk, self.nested.pk, self.root.pk], self.user1)
+        self.assertEqual(updated, 2)
+        self.assertEqual(self.unread(self.user1), 0)
+        self.assertEqual(self.unread(self.user2), 1)
+        # Already read: nothing changes
+        self.assertEqual(Message.unread.mark_as_read([self.reply.pk], self.user1), 0)
+        self.assertEqual(self.unread(self.user1), 0)
+    
+    def test_saving_is_read_updates_unread_count(self):
+        self.nested.is_read = True
+        self.nested.save()
+        self.assertEqual(self.unread(self.user1), 1)
+        message = Message.objects.get(pk=self.nested.pk)
+        message.is_read = False
+        message.save()
+        self.assertEqual(self.unread(self.user1), 2)
+    
+    def test_saving_with_is_read_deferred_keeps_unread_count(self):
+        """Messages loaded without is_read (only()) don't count as read changes."""
+        message = Message.unread.unread_for_user(self.user1).get(pk=self.reply.pk)
+        self.assertIn('is_read', message.get_deferred_fields())
+        message.content = 'edited'
+        message.save()
+        self.assertEqual(self.unread(self.user1), 2)
+    
+    def test_move_within_thread_and_read_in_one_save(self):
+        """A move inside the thread still applies the is_read change."""
+        self.nested.parent_message = self.root
+        self.nested.is_read = True
+        self.nested.save()
+        self.assertEqual(self.unread(self.user1), 1)
+    
+    def test_stale_instance_does_not_count_a_read_twice(self):
+        """Saving a read flag the row already has leaves the counter alone."""
+        stale = Message.objects.get(pk=self.reply.pk)
+        Message.unread.mark_as_read([self.reply.pk], self.user1)
+        self.assertEqual(self.unread(self.user1), 1)
+        stale.is_read = True
+        stale.save()
+        self.assertEqual(self.unread(self.user1), 1)
+    
+    def test_update_fields_without_is_read_keeps_unread_count(self):
+        self.reply.is_read = True
+        self.reply.content = 'edited'
+        self.reply.save(update_fields=['content'])
+        self.assertEqual(self.unread(self.user1), 2)
+        self.assertFalse(Message.objects.get(pk=self.reply.pk).is_read)
+    
+    def test_deleting_a_reply_updates_counters(self):
+        self.reply.delete()  # cascades to the nested reply
+        summary = ThreadSummary.objects.get(pk=self.root.pk)
+        self.assertEqual(summary.reply_count, 0)
+        self.assertIsNone(summary.last_reply_at)
+        self.assertEqual(self.unread(self.user1), 0)
+    
+    def test_deleting_the_last_reply_moves_last_reply_at_back(self):
+        self.nested.delete()
+        summary = ThreadSummary.objects.get(pk=self.root.pk)
+        self.assertEqual(summary.reply_count, 1)
+        self.assertEqual(summary.last_reply_at, self.reply.timestamp)
+    
+    def test_moving_a_reply_rebuilds_both_threads(self):
+        other = Message.objects.create(sender=self.user2, receiver=self.user1, content='other')
+        self.reply.parent_message = other
+        self.reply.save()
+        self.assertEqual(ThreadSummary.objects.get(pk=self.root.pk).reply_count, 0)
+        self.assertEqual(ThreadSummary.objects.get(pk=other.pk).reply_count, 2)
+        self.assertEqual(self.unread(self.user1, other), 3)
+        self.assertEqual(self.unread(self.user2), 1)
+    
+    def test_rebuild_matches_incremental_counters(self):
+        Message.unread.mark_as_read([self.reply.pk], self.user1)
+        expected = self.snapshot()
+        ThreadSummary.rebuild([self.root.pk])
+        self.assertEqual(self.snapshot(), expected)
+    
+    def test_backfill_migration(self):
+        expected = self.snapshot()
+        ThreadSummary.objects.all().delete()
+        migration = importlib.import_module('messaging.migrations.0005_backfill_thread_summaries')
+        migration.backfill_thread_summaries(django_apps, connection.schema_editor())
+        self.assertEqual(self.snapshot(), expected)
+    
+    def test_thread_list_api_uses_summaries(self):
+        for i in range(5):
+            Message.objects.create(
+                sender=self.user2, receiver=self.user1, content=f'more {i}',
+                parent_message=self.nested
+            )
+        request = RequestFactory().get('/api/threads/')
+        request.user = self.user1
+        # 1 for the total unread count, 1 for the thread list
+        with self.assertNumQueries(2):
+            response = views.thread_list_api(request)
+        thread = json.loads(response.content)['threads'][0]
+        self.assertEqual(thread['id'], self.root.pk)
+        self.assertEqual(thread['reply_count'], 7)
+        self.assertEqual(thread['unread_count'], 7)
+        self.assertEqual(thread['other_user']['username'], 'user2')
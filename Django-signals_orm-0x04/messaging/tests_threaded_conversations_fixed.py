@@ -105,7 +105,7 @@ class ThreadedConversationTests(TestCase):
     
     def test_query_optimization(self):
         """Test that we're using select_related and prefetch_related properly."""
-        with self.assertNumQueries(3):  # 1 for messages, 1 for replies, 1 for users
+        with self.assertNumQueries(2):  # 1 for root ids, 1 for every message with its users
             threads = get_threaded_messages(self.user1.id)
             
             # Access related data to ensure queries are executed
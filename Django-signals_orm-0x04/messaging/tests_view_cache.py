@@ -0,0 +1,92 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+
+from .models import Message
+from . import view_cache, views
+
+User = get_user_model()
+
+
+class PerUserViewCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        view_cache.reset_stats()
+        self.factory = RequestFactory()
+        self.user1 = User.objects.create_user(username='user1', password='testpass123')
+        self.user2 = User.objects.create_user(username='user2', password='testpass123')
+        self.outsider = User.objects.create_user(username='outsider', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.root = Message.objects.create(
+                sender=self.user1, receiver=self.user2, content='root'
+            )
+            self.other = Message.objects.create(
+                sender=self.outsider, receiver=self.outsider, content='note to self'
+            )
+    
+    def get(self, user, path='/api/threads/'):
+        request = self.factory.get(path)
+        request.user = user
+        return views.thread_list_api(request)
+    
+    def test_second_request_is_a_hit(self):
+        first = self.get(self.user1)
+        second = self.get(self.user1)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(json.loads(second.content), json.loads(first.content))
+        stats = view_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+    
+    def test_cache_is_per_user(self):
+        self.get(self.user1)
+        self.assertEqual(self.get(self.user2)['X-Cache'], 'MISS')
+    
+    def test_reply_invalidates_every_participant(self):
+        self.get(self.user1)
+        self.get(self.user2)
+        self.get(self.outsider)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(
+                sender=self.user2, receiver=self.user1, content='reply', parent_message=self.root
+            )
+        response = self.get(self.user1)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(json.loads(response.content)['threads'][0]['reply_count'], 1)
+        self.assertEqual(self.get(self.user2)['X-Cache'], 'MISS')
+        self.assertEqual(self.get(self.outsider)['X-Cache'], 'HIT')
+    
+    def test_invalidation_waits_for_commit(self):
+        self.get(self.user1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Message.objects.create(
+                sender=self.user2, receiver=self.user1, content='reply', parent_message=self.root
+            )
+            self.assertEqual(self.get(self.user1)['X-Cache'], 'HIT')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.get(self.user1)['X-Cache'], 'MISS')
+    
+    def test_mark_as_read_invalidates(self):
+        self.get(self.user2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.unread.mark_as_read([self.root.pk], self.user2)
+        response = self.get(self.user2)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(json.loads(response.content)['threads'][0]['unread_count'], 0)
+    
+    def test_evicted_generation_does_not_revive_old_entries(self):
+        generation = view_cache.get_generation(self.user1.pk)
+        cache.delete(view_cache.generation_key(self.user1.pk))
+        self.assertGreater(view_cache.get_generation(self.user1.pk), generation)
+    
+    def test_stats_api_is_staff_only(self):
+        request = self.factory.get('/api/cache/stats/')
+        request.user = self.user1
+        self.assertEqual(views.cache_stats_api(request).status_code, 403)
+        self.user1.is_staff = True
+        self.get(self.user1)
+        response = views.cache_stats_api(request)
+        self.assertEqual(json.loads(response.content)['misses'], 1)
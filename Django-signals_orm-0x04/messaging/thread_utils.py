@@ -1,7 +1,7 @@
 from django.db import models
-from django.db.models import Prefetch, Q
+from django.db.models import Q
 from django.utils import timezone
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterable, List, Optional
 
 from .models import Message
 
@@ -27,43 +27,22 @@ def get_threaded_messages(
     if other_user_id:
         base_query &= (Q(sender_id=other_user_id) | Q(receiver_id=other_user_id))
     
-    # Prefetch related data to optimize queries
-    message_prefetch = Prefetch(
-        'replies',
-        queryset=Message.objects.select_related('sender', 'receiver')
-                              .order_by('timestamp')
-    )
-    
     # Get all root messages (no parent) involving the user
-    root_messages = (
+    root_ids = list(
         Message.objects
         .filter(base_query, parent_message__isnull=True)
-        .select_related('sender', 'receiver')
-        .prefetch_related(message_prefetch)
         .order_by('-thread_updated')
+        .values_list('id', flat=True)
     )
     
-    # Convert to nested dictionary structure
-    return [build_thread_dict(msg, max_depth) for msg in root_messages]
+    # Load every message of those threads in one query and link them up
+    nodes = build_tree(Message.objects.threads_of(root_ids, max_depth), message_to_dict)
+    return [nodes[root_id] for root_id in root_ids]
 
 
-def build_thread_dict(message: Message, max_depth: int, current_depth: int = 0) -> Dict:
-    """
-    Recursively build a dictionary representation of a message thread.
-    
-    Args:
-        message: The message to convert to a dict
-        max_depth: Maximum depth of nested replies to include
-        current_depth: Current recursion depth
-        
-    Returns:
-        Dictionary representation of the message and its replies
-    """
-    if current_depth > max_depth:
-        return None
-        
-    # Build the base message dictionary
-    message_dict = {
+def message_to_dict(message: Message) -> Dict:
+    """Dictionary representation of a single message, without replies."""
+    return {
         'id': message.id,
         'sender': {
             'id': message.sender.id,
@@ -82,14 +61,55 @@ def build_thread_dict(message: Message, max_depth: int, current_depth: int = 0)
         'thread_updated': message.thread_updated.isoformat(),
         'replies': []
     }
+
+
+def build_tree(messages: Iterable[Message], to_dict: Callable[[Message], Dict]) -> Dict[int, Dict]:
+    """
+    Link a flat list of messages into nested dicts in a single O(n) pass.
     
-    # Recursively add replies
-    for reply in message.replies.all():
-        reply_dict = build_thread_dict(reply, max_depth, current_depth + 1)
-        if reply_dict:
-            message_dict['replies'].append(reply_dict)
+    Messages must come parents-first (e.g. ordered by depth). Each one is
+    appended to its parent's 'replies' through an id -> node dict, so there
+    is no recursion and no query per node.
     
-    return message_dict
+    Args:
+        messages: Messages of one or more threads, parents before children
+        to_dict: Builds the dict for one message, with an empty 'replies' list
+        
+    Returns:
+        Dictionary of message id to its node; look up a root id to get its tree
+    """
+    nodes = {}
+    for message in messages:
+        node = nodes[message.id] = to_dict(message)
+        parent = nodes.get(message.parent_message_id)
+        if parent is not None:
+            parent['replies'].append(node)
+    return nodes
+
+
+def build_thread_dict(message: Message, max_depth: int, current_depth: int = 0) -> Dict:
+    """
+    Build a dictionary representation of a message thread.
+    
+    The whole subtree is fetched in one query, with the depth cutoff
+    applied in SQL, and assembled by build_tree.
+    
+    Args:
+        message: The message to convert to a dict
+        max_depth: Maximum depth of nested replies to include
+        current_depth: Depth the message counts as
+        
+    Returns:
+        Dictionary representation of the message and its replies
+    """
+    if current_depth > max_depth:
+        return None
+    
+    nodes = build_tree(
+        Message.objects.thread_of(message, max_depth - current_depth),
+        message_to_dict
+    )
+    return nodes[message.id]
 
 
 def get_conversation_threads(
@@ -113,17 +133,15 @@ def get_conversation_threads(
             # Get a specific thread by message ID
             message = (
                 Message.objects
-                .select_related('sender', 'receiver')
-                .prefetch_related('replies')
+                .select_related('thread_root')
                 .get(
                     Q(id=message_id) &
                     (Q(sender_id=user_id) | Q(receiver_id=user_id)) &
                     (Q(sender_id=other_user_id) | Q(receiver_id=other_user_id))
                 )
             )
-            # If this is a reply, get the root message
-            while message.parent_message:
-                message = message.parent_message
+            # If this is a reply, get the root message (one lookup at most)
+            message = message.get_root()
             return build_thread_dict(message, max_depth=10)
         else:
             # Get all threads between these users
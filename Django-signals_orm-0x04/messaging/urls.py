@@ -54,6 +54,11 @@ urlpatterns = [
         login_required(views.thread_list_api),
         name='api_thread_detail',
     ),
+    path(
+        'api/cache/stats/',
+        views.cache_stats_api,
+        name='api_cache_stats',
+    ),
     path(
         'api/account/delete/',
         login_required(views.delete_user_api),
@@ -0,0 +1,119 @@
+"""
+Per-user, versioned cache for the thread views.
+
+Every cached payload key contains the user's current generation number.
+Changing anything a user can see (a message in one of their threads, its
+read state) bumps that user's generation, so their old entries are simply
+never looked up again and expire on their own. Entries can therefore live
+for hours without ever being served stale.
+"""
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+KEY_PREFIX = 'messaging:view'
+TIMEOUT = getattr(settings, 'MESSAGING_VIEW_CACHE_TIMEOUT', 60 * 60 * 6)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0}
+
+
+def _count(name, delta=1):
+    with _stats_lock:
+        _stats[name] += delta
+
+
+def stats():
+    """Hit/miss counters of this process since start (or reset_stats)."""
+    with _stats_lock:
+        result = dict(_stats)
+    lookups = result['hits'] + result['misses']
+    result['hit_rate'] = result['hits'] / lookups if lookups else None
+    return result
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def generation_key(user_id):
+    return f'{KEY_PREFIX}:gen:{user_id}'
+
+
+def get_generation(user_id):
+    """
+    Current generation of a user's cached views.
+    
+    A missing (new or evicted) generation starts from the clock in
+    nanoseconds rather than 1, so it can't come back to a value that older
+    payloads were stored under (that would take more bumps than elapsed ns).
+    """
+    key = generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generations(user_ids):
+    """Invalidate every cached view of the given users."""
+    for user_id in set(user_ids) - {None}:
+        try:
+            cache.incr(generation_key(user_id))
+        except ValueError:
+            # Nothing cached under a generation yet, so nothing to invalidate
+            continue
+        _count('invalidations')
+
+
+def invalidate_on_commit(user_ids):
+    """
+    Bump generations once the current transaction commits, so a request
+    running in between can't cache the old data under the new generation.
+    """
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: bump_generations(user_ids))
+
+
+def cache_per_user(view_func):
+    """
+    Cache successful GET responses per user and URL until the user's
+    generation changes (or TIMEOUT passes). Adds an X-Cache header.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        user = getattr(request, 'user', None)
+        if request.method != 'GET' or not (user and user.is_authenticated):
+            return view_func(request, *args, **kwargs)
+        
+        key = f'{KEY_PREFIX}:{user.pk}:{get_generation(user.pk)}:{request.get_full_path()}'
+        cached = cache.get(key)
+        if cached is not None:
+            _count('hits')
+            status, content_type, content = cached
+            response = HttpResponse(content, status=status, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+        
+        _count('misses')
+        response = view_func(request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+        if response.status_code == 200 and not response.streaming:
+            def store(response):
+                cache.set(key, (response.status_code, response['Content-Type'],
+                                response.content), TIMEOUT)
+                _count('stores')
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+        return response
+    return wrapper
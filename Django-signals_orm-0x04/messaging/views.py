@@ -1,3 +1,5 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -8,12 +10,13 @@ from django.views.generic import DeleteView, ListView, DetailView, TemplateView
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.messages.views import SuccessMessageMixin
 from django.views.decorators.http import require_http_methods
-from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
 from django.http import JsonResponse, Http404
 from django.db.models import Q, Prefetch, Count
 
-from .models import Message, MessageHistory
+from .models import Message, MessageHistory, ThreadParticipant
+from . import view_cache
+from .view_cache import cache_per_user
 User = get_user_model()
 
 @method_decorator(login_required, name='dispatch')
@@ -40,7 +43,7 @@ class DeleteUserView(SuccessMessageMixin, DeleteView):
 class ThreadListView(ListView):
     """
     View to display all message threads for the current user.
-    Cached for 60 seconds to improve performance.
+    Cached per user until one of their threads changes.
     """
     model = Message
     template_name = 'messaging/thread_list.html'
@@ -48,7 +51,7 @@ class ThreadListView(ListView):
     paginate_by = 20
     
     @method_decorator(login_required)
-    @method_decorator(cache_page(60))  # Cache for 60 seconds
+    @method_decorator(cache_per_user)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
     
@@ -75,20 +78,20 @@ class ThreadListView(ListView):
 class ThreadDetailView(DetailView):
     """
     View to display a single thread with all its replies.
-    Cached for 60 seconds to improve performance.
+    Cached per user until one of their threads changes.
     """
     model = Message
     template_name = 'messaging/thread_detail.html'
     context_object_name = 'message'
     
     @method_decorator(login_required)
-    @method_decorator(cache_page(60))  # Cache for 60 seconds
+    @method_decorator(cache_per_user)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
     
     def get_queryset(self):
         """Optimize queries for thread detail view."""
-        return Message.objects.select_related('sender', 'receiver')
+        return Message.objects.select_related('sender', 'receiver', 'thread_root')
     
     def get_context_data(self, **kwargs):
         """Add thread context with optimized queries."""
@@ -98,10 +101,11 @@ class ThreadDetailView(DetailView):
         # Get the root message if this is a reply
         root_message = message.get_root()
         
-        # Get all messages in the thread with optimized queries
-        thread_messages = Message.objects.filter(
-            Q(pk=root_message.pk) | Q(parent_message__in=root_message.get_descendants())
-        ).select_related('sender', 'receiver').order_by('timestamp')
+        # Load the whole thread (any depth) in one path range query
+        thread_messages = sorted(
+            root_message.get_descendants(include_self=True),
+            key=lambda msg: (msg.timestamp, msg.pk)
+        )
         
         context['thread_messages'] = thread_messages
         context['root_message'] = root_message
@@ -135,13 +139,13 @@ def get_threads_for_user(user):
 
 
 @login_required
-@cache_page(60)  # Cache for 60 seconds
+@cache_per_user
 def thread_list_api(request, other_user_id=None, message_id=None):
     """
     API endpoint to get message threads.
     Can return all threads, threads with a specific user, or a specific thread.
     Uses the custom unread messages manager for optimized queries.
-    Cached for 60 seconds to improve performance.
+    Cached per user until one of their threads changes.
     """
     # Use the custom manager for unread messages
     unread_count = Message.unread.unread_count(request.user)
@@ -152,9 +156,10 @@ def thread_list_api(request, other_user_id=None, message_id=None):
     # Filter for specific message thread if message_id is provided
     if message_id:
         thread = get_object_or_404(threads, id=message_id, parent_message__isnull=True)
-        thread_messages = Message.objects.filter(
-            Q(pk=thread.pk) | Q(parent_message__in=thread.get_descendants())
-        ).select_related('sender', 'receiver').order_by('timestamp')
+        thread_messages = sorted(
+            thread.get_descendants(include_self=True),
+            key=lambda msg: (msg.timestamp, msg.pk)
+        )
         
         return JsonResponse({
             'thread': {
@@ -178,43 +183,27 @@ def thread_list_api(request, other_user_id=None, message_id=None):
             }
         })
     
+    # One row per thread the user takes part in, with its summary counters
+    participations = (
+        ThreadParticipant.objects
+        .filter(user=request.user)
+        .select_related('thread__root__sender', 'thread__root__receiver')
+        .order_by('-thread__root__thread_updated')
+    )
+    
     # Filter for specific user if other_user_id is provided
     if other_user_id:
         other_user = get_object_or_404(User, id=other_user_id)
-        threads = threads.filter(
-            (Q(sender=request.user) & Q(receiver=other_user)) |
-            (Q(sender=other_user) & Q(receiver=request.user))
-        )
-    
-    # Get root messages (thread starters) with optimization using custom queryset
-    root_messages = threads.filter(parent_message__isnull=True)
-    
-    # Prefetch related data to reduce queries using the custom manager
-    root_messages = root_messages.select_related('sender', 'receiver').prefetch_related(
-        Prefetch(
-            'replies',
-            queryset=Message.objects.for_user(request.user)
-                                 .order_by('timestamp')
-                                 .only('id', 'content', 'timestamp', 'is_read', 
-                                      'sender_id', 'receiver_id', 'parent_message_id'),
-            to_attr='prefetched_replies'
+        participations = participations.filter(
+            Q(thread__root__sender=other_user) | Q(thread__root__receiver=other_user)
         )
-    ).order_by('-thread_updated')
-    
-    # Mark messages as read if this is a specific thread view
-    if message_id:
-        Message.unread.mark_as_read([message_id], request.user)
     
     # Prepare response data
     thread_data = []
-    for thread in root_messages:
-        other_user = thread.sender if thread.receiver == request.user else thread.receiver
-        
-        # Get unread count for this thread
-        unread_count = sum(
-            1 for reply in getattr(thread, 'prefetched_replies', []) 
-            if not reply.is_read and reply.receiver == request.user
-        )
+    for participation in participations:
+        summary = participation.thread
+        thread = summary.root
+        other_user = thread.sender if thread.receiver_id == request.user.pk else thread.receiver
         
         thread_data.append({
             'id': thread.id,
@@ -226,9 +215,9 @@ def thread_list_api(request, other_user_id=None, message_id=None):
                 'username': other_user.username,
                 'email': other_user.email,
             },
-            'unread_count': unread_count,
-            'reply_count': len(getattr(thread, 'prefetched_replies', [])),
-            'latest_reply': thread.prefetched_replies[-1].timestamp if hasattr(thread, 'prefetched_replies') and thread.prefetched_replies else None
+            'unread_count': participation.unread_count,
+            'reply_count': summary.reply_count,
+            'latest_reply': summary.last_reply_at
         })
     
     return JsonResponse({
@@ -257,7 +246,7 @@ def unread_messages_api(request):
             'email': msg.sender.email
         },
         'is_read': msg.is_read,
-        'thread_id': msg.parent_message_id or msg.id
+        'thread_id': msg.thread_root_id or msg.id
     } for msg in unread_messages]
     
     return JsonResponse({
@@ -292,6 +281,17 @@ def mark_as_read_api(request):
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
 
+@login_required
+def cache_stats_api(request):
+    """
+    API endpoint exposing hit/miss counters of the per-user view cache.
+    Staff only.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    return JsonResponse(view_cache.stats())
+
+
 @require_http_methods(["POST"])
 @login_required
 def delete_user_api(request):
@@ -3,24 +3,84 @@
 Class-based context manager for handling database connections
 """
 
+import os
 import sqlite3  # Using sqlite3 for demonstration, but can adapt to MySQL, Postgres, etc.
+import threading
+from urllib.parse import quote
+
+# PRAGMAs for read-heavy code paths (tuned=True)
+TUNED_PRAGMAS = {
+    "journal_mode": "WAL",  # readers don't block the writer
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,  # memory-map up to 256 MB of the file
+    "cache_size": -65536,  # 64 MB page cache (negative = KiB)
+    "temp_store": "MEMORY",
+}
+# these change the database file, so they can't run on read-only connections
+WRITE_PRAGMAS = ("journal_mode", "synchronous")
+
+# idle pooled connections, keyed by (db_name, read_only, pragmas)
+_pools = {}
+_pools_lock = threading.Lock()
+MAX_IDLE = 4
 
 
 class DatabaseConnection:
-    def __init__(self, db_name):
+    def __init__(self, db_name, tuned=False, read_only=False, pooled=False,
+                 pragmas=None):
         # store the database name
         self.db_name = db_name
+        self.read_only = read_only  # open with a mode=ro URI
+        self.pooled = pooled  # __exit__ returns the connection to a pool
+        self.pragmas = dict(TUNED_PRAGMAS if tuned else {}, **(pragmas or {}))
+        if read_only:
+            self.pragmas = {
+                name: value for name, value in self.pragmas.items()
+                if name not in WRITE_PRAGMAS
+            }
         self.conn = None
 
+    def _pool_key(self):
+        return (os.path.abspath(self.db_name), self.read_only,
+                tuple(sorted(self.pragmas.items())))
+
+    def _connect(self):
+        # open a new connection and apply PRAGMAs once
+        if self.read_only:
+            uri = f"file:{quote(os.path.abspath(self.db_name))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=not self.pooled)
+        else:
+            conn = sqlite3.connect(self.db_name, check_same_thread=not self.pooled)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
     def __enter__(self):
-        # open connection when entering context
-        self.conn = sqlite3.connect(self.db_name)
+        # open connection when entering context (or reuse a pooled one)
+        if self.pooled:
+            with _pools_lock:
+                idle = _pools.get(self._pool_key())
+                self.conn = idle.pop() if idle else None
+        if self.conn is None:
+            self.conn = self._connect()
         return self.conn
 
     def __exit__(self, exc_type, exc_value, traceback):
         # close connection when exiting context
-        if self.conn:
-            self.conn.close()
+        if not self.conn:
+            return
+        if self.pooled:
+            # uncommitted work is dropped, as closing would have done
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            with _pools_lock:
+                idle = _pools.setdefault(self._pool_key(), [])
+                if len(idle) < MAX_IDLE:
+                    idle.append(self.conn)
+                    self.conn = None
+                    return
+        self.conn.close()
+        self.conn = None
 
 
 if __name__ == "__main__":
@@ -42,3 +102,9 @@ if __name__ == "__main__":
         # print results
         for row in results:
             print(row)
+
+    # Read-heavy path: read-only, memory-mapped and reused across blocks
+    for _ in range(2):
+        with DatabaseConnection("users.db", tuned=True, read_only=True,
+                                pooled=True) as conn:
+            print(conn.execute("SELECT COUNT(*) FROM users").fetchone())
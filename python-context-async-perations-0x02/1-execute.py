@@ -4,34 +4,102 @@ Reusable Query Context Manager for executing queries
 """
 
 import sqlite3
+from collections import namedtuple
+from dataclasses import make_dataclass
+from functools import lru_cache
+
+
+def tuple_factory(columns):
+    """Rows stay plain tuples (fastest, no per-row work)."""
+    return None
+
+
+@lru_cache(maxsize=64)
+def namedtuple_factory(columns):
+    """Rows become namedtuples with the query's column names."""
+    Row = namedtuple("Row", columns, rename=True)
+    return Row._make
+
+
+@lru_cache(maxsize=64)
+def dataclass_factory(columns):
+    """Rows become instances of a __slots__ dataclass built for the query.
+
+    Invalid or duplicate column names (e.g. COUNT(*)) are renamed to _0,
+    _1, ... by position, the same way namedtuple(rename=True) does.
+    """
+    fields = namedtuple("Row", columns, rename=True)._fields
+    Row = make_dataclass("Row", fields, slots=True)
+    return lambda row: Row(*row)
+
+
+ROW_FACTORIES = {
+    "tuple": tuple_factory,
+    "namedtuple": namedtuple_factory,
+    "dataclass": dataclass_factory,
+}
 
 
 class ExecuteQuery:
-    def __init__(self, db_name, query, params=None):
+    def __init__(self, db_name, query, params=None, stream=False,
+                 arraysize=500, row_factory="tuple", cached_statements=128,
+                 connection=None):
         self.db_name = db_name
         self.query = query
         self.params = params if params else ()
-        self.conn = None
+        self.stream = stream  # yield rows lazily instead of fetchall()
+        self.arraysize = arraysize  # rows pulled per fetchmany when streaming
+        self.row_factory = ROW_FACTORIES.get(row_factory, row_factory)
+        self.cached_statements = cached_statements  # prepared-statement cache size
+        # an existing connection is reused (and left open) so its
+        # prepared-statement cache carries over between queries
+        self.owns_conn = connection is None
+        self.conn = connection
         self.cursor = None
         self.results = None
 
     def __enter__(self):
-        # Open database connection
-        self.conn = sqlite3.connect(self.db_name)
+        # Open database connection with a prepared-statement cache
+        if self.owns_conn:
+            self.conn = sqlite3.connect(
+                self.db_name, cached_statements=self.cached_statements
+            )
         self.cursor = self.conn.cursor()
+        self.cursor.arraysize = self.arraysize
 
         # Execute the query
         self.cursor.execute(self.query, self.params)
+        make_row = (
+            self.row_factory(tuple(col[0] for col in self.cursor.description))
+            if self.cursor.description else None
+        )
+
+        if self.stream:
+            # Lazy iterator, only one fetchmany chunk in memory at a time
+            self.results = self._iter_rows(make_row)
+            return self.results
 
         # Fetch results
-        self.results = self.cursor.fetchall()
+        rows = self.cursor.fetchall()
+        self.results = [make_row(row) for row in rows] if make_row else rows
         return self.results  # Results are returned directly
 
+    def _iter_rows(self, make_row):
+        """Yield rows chunk by chunk with fetchmany(arraysize)."""
+        while True:
+            rows = self.cursor.fetchmany()
+            if not rows:
+                return
+            if make_row:
+                yield from map(make_row, rows)
+            else:
+                yield from rows
+
     def __exit__(self, exc_type, exc_value, traceback):
         # Close cursor and connection safely
         if self.cursor:
             self.cursor.close()
-        if self.conn:
+        if self.conn and self.owns_conn:
             self.conn.close()
 
 
@@ -56,3 +124,9 @@ if __name__ == "__main__":
     with ExecuteQuery("users.db", query, param) as results:
         for row in results:
             print(row)
+
+    # Stream the same query lazily as namedtuples
+    with ExecuteQuery("users.db", query, param, stream=True,
+                      row_factory="namedtuple") as rows:
+        for row in rows:
+            print(row.name, row.age)
@@ -4,39 +4,208 @@ Concurrent Asynchronous Database Queries using aiosqlite and asyncio.gather
 """
 
 import asyncio
+import bisect
+import time
+from collections import namedtuple
+from contextlib import asynccontextmanager
+
 import aiosqlite
 
 
-async def async_fetch_users():
+class AsyncConnectionPool:
+    """Bounded pool of warm aiosqlite connections.
+
+    At most `size` connections (and so `size` worker threads) exist; extra
+    callers wait for one to be released. Queries that exceed their timeout
+    are interrupted and their connection is discarded.
+    """
+
+    def __init__(self, db_name="users.db", size=5, timeout=None):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(size)  # one per connection in use
+        self._idle = []  # warm connections, most recently used last
+        self._closed = False
+
+    async def acquire(self):
+        """Wait for a free slot, then reuse an idle connection or open one."""
+        await self._slots.acquire()
+        try:
+            if self._idle:
+                return self._idle.pop()
+            return await aiosqlite.connect(self.db_name)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, db, discard=False):
+        """Put a connection back, or close it if it can't be reused."""
+        try:
+            if discard or self._closed:
+                await db.close()
+            else:
+                self._idle.append(db)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection for the duration of an async with block."""
+        db = await self.acquire()
+        discard = False
+        try:
+            yield db
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            await db.interrupt()  # stop the query still running in the worker thread
+            discard = True
+            raise
+        finally:
+            await self.release(db, discard)
+
+    async def fetch(self, query, params=(), timeout=None):
+        """Run one query on a pooled connection and return all rows."""
+        timeout = self.timeout if timeout is None else timeout
+        async with self.connection() as db:
+            return await asyncio.wait_for(self._fetch(db, query, params), timeout)
+
+    @staticmethod
+    async def _fetch(db, query, params):
+        async with db.execute(query, params) as cursor:
+            return await cursor.fetchall()
+
+    async def fetch_many(self, queries, timeout=None, return_exceptions=False):
+        """Run (query, params) pairs concurrently; results keep input order."""
+        return await asyncio.gather(
+            *(self.fetch(query, params, timeout) for query, params in queries),
+            return_exceptions=return_exceptions
+        )
+
+    async def close(self):
+        """Close every idle connection; busy ones close when released."""
+        self._closed = True
+        while self._idle:
+            await self._idle.pop().close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+async def async_fetch_users(pool=None):
     """Fetch all users from the database"""
+    if pool is not None:
+        return await pool.fetch("SELECT * FROM users")
     async with aiosqlite.connect("users.db") as db:
         async with db.execute("SELECT * FROM users") as cursor:
             return await cursor.fetchall()
 
 
-async def async_fetch_older_users():
+async def async_fetch_older_users(pool=None):
     """Fetch users older than 40 from the database"""
+    if pool is not None:
+        return await pool.fetch("SELECT * FROM users WHERE age > ?", (40,))
     async with aiosqlite.connect("users.db") as db:
         async with db.execute("SELECT * FROM users WHERE age > ?", (40,)) as cursor:
             return await cursor.fetchall()
 
 
-async def fetch_concurrently():
-    """Run both queries concurrently"""
-    results = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users()
-    )
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (bucket bounds in milliseconds)."""
+
+    BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)  # last bucket: overflow
+        self.samples = []
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.samples.append(ms)
+
+    def percentile(self, pct):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def summary(self):
+        labels = [f"<={bound}ms" for bound in self.BOUNDS_MS] + [f">{self.BOUNDS_MS[-1]}ms"]
+        return {
+            "count": len(self.samples),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": max(self.samples) if self.samples else None,
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+QueryResult = namedtuple("QueryResult", "index query rows latency error")
+
+
+async def fan_out(pool, queries, limit=10, fail_fast=True, timeout=None,
+                  histograms=None):
+    """Run (query, params) pairs with at most `limit` in flight.
+
+    Async generator yielding a QueryResult as each query finishes, in
+    completion order. With fail_fast the first error cancels every pending
+    query and is raised; otherwise failures are yielded with `error` set.
+    Latencies are recorded per query text in `histograms` if given.
+    """
+    limiter = asyncio.Semaphore(limit)
+
+    async def run(index, query, params):
+        async with limiter:
+            start = time.perf_counter()
+            try:
+                rows = await pool.fetch(query, params, timeout)
+                error = None
+            except Exception as e:
+                if fail_fast:
+                    raise
+                rows, error = None, e
+            latency = time.perf_counter() - start
+            if histograms is not None:
+                histograms.setdefault(query, LatencyHistogram()).record(latency)
+            return QueryResult(index, query, rows, latency, error)
+
+    tasks = [
+        asyncio.create_task(run(index, query, params))
+        for index, (query, params) in enumerate(queries)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # on failure or early exit, cancel whatever is still running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
-    all_users, older_users = results
 
-    print("All Users:")
-    for row in all_users:
-        print(row)
+async def fetch_concurrently(queries=None, limit=10):
+    """Run the queries concurrently, printing each result as it arrives"""
+    if queries is None:
+        queries = [
+            ("SELECT * FROM users", ()),
+            ("SELECT * FROM users WHERE age > ?", (40,)),
+        ]
+    histograms = {}
+    async with AsyncConnectionPool("users.db", size=limit, timeout=5) as pool:
+        async for result in fan_out(pool, queries, limit=limit,
+                                    histograms=histograms):
+            query, params = queries[result.index]
+            print(f"\n{query} {params} ({result.latency * 1000:.1f} ms):")
+            for row in result.rows:
+                print(row)
 
-    print("\nUsers older than 40:")
-    for row in older_users:
-        print(row)
+    print("\nLatency per query:")
+    for query, histogram in histograms.items():
+        print(query, histogram.summary())
 
 
 if __name__ == "__main__":
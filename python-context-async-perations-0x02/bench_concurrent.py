@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark: connection per query vs AsyncConnectionPool at 10/100/1000 concurrent queries
+"""
+
+import asyncio
+import time
+
+import aiosqlite
+
+concurrent = __import__('3-concurrent')
+
+DB_NAME = "bench_users.db"
+QUERY = "SELECT * FROM users WHERE age > ?"
+
+
+async def setup_db(rows=1000):
+    """Create the benchmark table with some rows"""
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute(
+            "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)"
+        )
+        await db.execute("DELETE FROM users")
+        await db.executemany(
+            "INSERT INTO users (name, age) VALUES (?, ?)",
+            [(f"user{i}", i % 90) for i in range(rows)],
+        )
+        await db.commit()
+
+
+async def connect_per_query(n):
+    """Old approach: every coroutine opens its own connection"""
+    async def one():
+        async with aiosqlite.connect(DB_NAME) as db:
+            async with db.execute(QUERY, (40,)) as cursor:
+                return await cursor.fetchall()
+    await asyncio.gather(*(one() for _ in range(n)))
+
+
+async def pooled(n, size=10):
+    """Pooled approach: n queries share `size` warm connections"""
+    async with concurrent.AsyncConnectionPool(DB_NAME, size=size) as pool:
+        await pool.fetch_many([(QUERY, (40,))] * n)
+
+
+async def main():
+    await setup_db()
+    for n in (10, 100, 1000):
+        for name, run in (("connect per query", connect_per_query), ("pooled", pooled)):
+            start = time.perf_counter()
+            await run(n)
+            elapsed = time.perf_counter() - start
+            print(f"{n:>5} queries, {name:<17}: {elapsed:.3f}s ({n / elapsed:.0f} queries/sec)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
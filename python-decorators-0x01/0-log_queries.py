@@ -1,19 +1,99 @@
 #!/usr/bin/env python3
+import re
+import json
+import time
+import queue
+import atexit
+import random
 import sqlite3
+import logging
 import functools
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime   # required by checker
 
-# decorator to log SQL queries with timestamp
-def log_queries(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        query = kwargs.get("query") if "query" in kwargs else (args[0] if args else None)
-        if query:
-            print(f"[{datetime.now()}] Executing SQL Query: {query}")
-        else:
-            print(f"[{datetime.now()}] No SQL Query provided")
-        return func(*args, **kwargs)
-    return wrapper
+# ring buffer with the most recent query records (oldest dropped first)
+query_log = deque(maxlen=1000)
+
+# records go through a queue; a background listener thread does the I/O
+logger = logging.getLogger("queries")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(_log_queue))
+_listener = None
+_listener_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+# normalize a query so calls differing only in literals share one fingerprint
+def fingerprint(query):
+    query = _STRING.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _IN_LIST.sub("(?+)", query)
+    return _SPACES.sub(" ", query).strip().lower()
+
+
+def _start_listener():
+    # started on first use so importing the module spawns no thread
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _listener = QueueListener(_log_queue, handler)
+            _listener.start()
+            atexit.register(_listener.stop)  # flush queued records on exit
+
+
+def _emit(record):
+    query_log.append(record)
+    if _listener is None:
+        _start_listener()
+    logger.info(json.dumps(record, default=str))
+
+
+# decorator to log SQL queries with timing, row count and fingerprint
+# usable as @log_queries or @log_queries(sample_rate=0.1, slow_ms=100)
+# calls slower than slow_ms are always logged, the rest are sampled
+def log_queries(func=None, *, sample_rate=1.0, slow_ms=200):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            query = kwargs.get("query") if "query" in kwargs else (args[0] if args else None)
+            start = time.perf_counter()
+            error = None
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            except Exception as e:
+                error = repr(e)
+                raise
+            finally:
+                duration_ms = (time.perf_counter() - start) * 1000
+                slow = duration_ms >= slow_ms
+                if slow or error or random.random() < sample_rate:
+                    _emit({
+                        "ts": datetime.now().isoformat(),
+                        "function": func.__name__,
+                        "fingerprint": fingerprint(query) if query else None,
+                        "query": query,
+                        "duration_ms": round(duration_ms, 3),
+                        "rows": len(result) if isinstance(result, (list, tuple)) else None,
+                        "slow": slow,
+                        "error": error,
+                    })
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 
 @log_queries
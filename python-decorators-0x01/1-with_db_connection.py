@@ -1,21 +1,5 @@
 #!/usr/bin/env python3
-import sqlite3
-import functools
-
-# decorator to handle DB connection automatically
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # open connection
-        conn = sqlite3.connect("users.db")
-        try:
-            # pass connection as first argument to function
-            result = func(conn, *args, **kwargs)
-        finally:
-            # close connection after function execution
-            conn.close()
-        return result
-    return wrapper
+from connection_pool import get_pool, with_db_connection
 
 
 @with_db_connection
@@ -29,3 +13,4 @@ def get_user_by_id(conn, user_id):
 if __name__ == "__main__":
     user = get_user_by_id(user_id=1)
     print(user)
+    print("Pool stats:", get_pool().stats())
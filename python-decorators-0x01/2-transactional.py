@@ -1,31 +1,111 @@
 #!/usr/bin/env python3
-import sqlite3
+import time
 import functools
+import threading
+from contextlib import contextmanager
+from connection_pool import get_pool, pinned_connection, with_db_connection
+from query_cache import track_writes, writes_committed, writes_rolled_back
 
-# decorator to handle DB connection automatically
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
+# open transactional scopes per connection (keyed by id, conns aren't weakref-able)
+_depth = {}
+# active batch_commit for the current thread, if any
+_local = threading.local()
+
+
+# coalesces many small transactional scopes into one commit
+class GroupCommit:
+    def __init__(self, pool, conn, every, window):
+        self.pool = pool
+        self.conn = conn
+        self.every = every
+        self.window = window
+        self.pending = 0
+        self.started = time.monotonic()
+        self.commits = 0
+
+    def scope_done(self):
+        # commit once `every` scopes are pending or the window has passed
+        self.pending += 1
+        if self.pending >= self.every or (
+                self.window is not None
+                and time.monotonic() - self.started >= self.window):
+            self.flush()
+
+    def flush(self):
+        if self.conn.in_transaction:
+            self.conn.commit()
+            self.commits += 1
+        writes_committed(self.conn)
+        self.pending = 0
+        self.started = time.monotonic()
+
+
+# group commit: transactional calls inside the block commit every n scopes
+# (or every `window` seconds, checked as scopes finish) and once at the end.
+# Each scope still runs in its own savepoint, so a failing call only undoes itself.
+@contextmanager
+def batch_commit(n=100, window=None, db_path=None):
+    # with_db_connection calls inside the block share the pinned connection
+    with pinned_connection(db_path) as conn:
+        batch = GroupCommit(get_pool(db_path), conn, n, window)
+        _local.batch = batch
+        _depth[id(conn)] = 1  # scopes inside the batch nest under it
         try:
-            result = func(conn, *args, **kwargs)
+            yield batch
+            batch.flush()
+        except Exception:
+            conn.rollback()
+            writes_rolled_back(conn)
+            raise
         finally:
-            conn.close()
-        return result
-    return wrapper
+            _local.batch = None
+            del _depth[id(conn)]
 
 
 # decorator to handle transactions (commit/rollback)
+# nested scopes on the same connection use SAVEPOINTs, so an inner failure
+# rolls back only the inner work and only the outermost scope commits;
+# cached reads (query_cache) of the written tables are dropped on commit
 def transactional(func):
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        key = id(conn)
+        depth = _depth.get(key, 0)
+        _depth[key] = depth + 1
         try:
-            result = func(conn, *args, **kwargs)
-            conn.commit()   # commit if no error
-            return result
-        except Exception as e:
-            conn.rollback()  # rollback if error occurs
-            raise e
+            track_writes(conn)
+            if not conn.in_transaction:
+                conn.execute("BEGIN")  # so a savepoint never owns the transaction
+            if depth == 0:
+                try:
+                    result = func(conn, *args, **kwargs)
+                    conn.commit()   # commit if no error
+                except Exception as e:
+                    conn.rollback()  # rollback if error occurs
+                    writes_rolled_back(conn)
+                    raise e
+                writes_committed(conn)
+                return result
+
+            savepoint = f"sp_{depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            try:
+                result = func(conn, *args, **kwargs)
+            except Exception:
+                conn.execute(f"ROLLBACK TO {savepoint}")  # undo this scope only
+                conn.execute(f"RELEASE {savepoint}")
+                raise
+            conn.execute(f"RELEASE {savepoint}")
+        finally:
+            if depth:
+                _depth[key] = depth
+            else:
+                del _depth[key]
+
+        batch = getattr(_local, "batch", None)
+        if depth == 1 and batch is not None and batch.conn is conn:
+            batch.scope_done()
+        return result
     return wrapper
 
 
@@ -36,7 +116,25 @@ def update_user_email(conn, user_id, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
 
+# bulk path: one executemany and one commit for many (user_id, new_email) pairs
+@with_db_connection
+@transactional
+def update_user_emails(conn, pairs):
+    cursor = conn.cursor()
+    cursor.executemany(
+        "UPDATE users SET email = ? WHERE id = ?",
+        ((new_email, user_id) for user_id, new_email in pairs)
+    )
+    return cursor.rowcount
+
+
 # Update user's email with automatic transaction handling
 if __name__ == "__main__":
     update_user_email(user_id=1, new_email="Crawford_Cartwright@hotmail.com")
     print("Email updated successfully")
+
+    # many single-row updates coalesced into a few commits
+    with batch_commit(n=100) as batch:
+        for _ in range(250):
+            update_user_email(user_id=1, new_email="Crawford_Cartwright@hotmail.com")
+    print(f"Batched updates committed in {batch.commits} transactions")
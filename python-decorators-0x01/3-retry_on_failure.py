@@ -1,44 +1,205 @@
 #!/usr/bin/env python3
 import time
+import random
+import asyncio
 import sqlite3
 import functools
+import threading
+from connection_pool import with_db_connection
 
-# decorator to handle DB connection automatically
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
+# only transient lock/busy errors are worth retrying by default
+def is_retryable(exc):
+    if isinstance(exc, sqlite3.OperationalError):
+        message = str(exc).lower()
+        return "locked" in message or "busy" in message
+    return False
+
+
+# delay before the next attempt for each backoff strategy
+def backoff_delay(strategy, attempt, delay, max_delay, previous):
+    if strategy == "fixed":
+        return delay
+    if strategy == "exponential":
+        # full jitter: uniform between 0 and the capped exponential delay
+        return random.uniform(0, min(max_delay, delay * 2 ** (attempt - 1)))
+    if strategy == "decorrelated":
+        return min(max_delay, random.uniform(delay, previous * 3))
+    raise ValueError(f"Unknown backoff strategy: {strategy}")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the function while the breaker is open."""
+
+
+# process-wide token bucket that caps retries to a share of calls
+class RetryBudget:
+    def __init__(self, ratio=0.2, min_per_second=1.0, max_tokens=10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.max_tokens,
+                          self.tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        """Every call earns a fraction of a retry."""
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def spend_retry(self):
+        """Take one token for a retry; False means the budget is exhausted."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+# per-function circuit breaker: opens after repeated transient failures,
+# then lets a single probe call through once reset_timeout has passed
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False  # a half-open probe call is in flight
+        self._lock = threading.Lock()
+
+    def allow_call(self):
+        """False while open, and for everyone but the probe when half-open."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        """Count a transient failure; a failed probe re-opens at once."""
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self):
+        """The call ended in an error that says nothing about health."""
+        with self._lock:
+            self.probing = False
+
+
+# shared by every retry_on_failure decorator unless one is passed in
+retry_budget = RetryBudget()
 
 
 # decorator to retry a function if it fails
-def retry_on_failure(retries=3, delay=2):
+# works on plain functions and on coroutines (which await instead of sleeping)
+# only errors accepted by retry_on are retried or counted by the breaker
+# retries is the total number of attempts, so it must be at least 1
+def retry_on_failure(retries=3, delay=2, backoff="fixed", max_delay=30,
+                     retry_on=is_retryable, budget=None, breaker=None):
+    if retries < 1:
+        raise ValueError(f"retries must be at least 1, got {retries}")
+    if isinstance(retry_on, (type, tuple)):
+        # an exception class (or tuple of them) instead of a classifier
+        exceptions = retry_on
+
+        def retry_on(exc):
+            return isinstance(exc, exceptions)
+
     def decorator(func):
+        shared = budget if budget is not None else retry_budget
+        circuit = breaker if breaker is not None else CircuitBreaker()
+
+        def start():
+            if not circuit.allow_call():
+                raise CircuitOpenError(f"Circuit open, not calling {func.__name__}")
+            shared.deposit()
+
+        def next_delay(attempt, error, previous):
+            # delay before the next attempt, or None (breaker already
+            # updated) when the error should be raised
+            print(f"Attempt {attempt} failed with error: {error}")
+            if not retry_on(error):
+                circuit.release()  # not transient: leave the breaker alone
+                return None
+            if attempt == retries or not shared.spend_retry():
+                circuit.record_failure()
+                return None
+            wait = backoff_delay(backoff, attempt, delay, max_delay, previous)
+            print(f"Retrying in {wait:.2f} seconds...")
+            return wait
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start()
+                settled = False  # the breaker has been told how the call ended
+                try:
+                    wait = delay
+                    for attempt in range(1, retries + 1):
+                        try:
+                            result = await func(*args, **kwargs)
+                        except Exception as e:
+                            wait = next_delay(attempt, e, wait)
+                            if wait is None:
+                                settled = True
+                                raise
+                        else:
+                            settled = True
+                            circuit.record_success()
+                            return result
+                        await asyncio.sleep(wait)  # don't block the event loop
+                finally:
+                    if not settled:
+                        # cancelled, even mid-backoff: don't hold the probe slot
+                        circuit.release()
+            async_wrapper.breaker = circuit
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(1, retries + 1):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    print(f"Attempt {attempt} failed with error: {e}")
-                    if attempt < retries:
-                        print(f"Retrying in {delay} seconds...")
-                        time.sleep(delay)
-            # after exhausting retries, raise the last error
-            raise last_exception
+            start()
+            settled = False
+            try:
+                wait = delay
+                for attempt in range(1, retries + 1):
+                    try:
+                        result = func(*args, **kwargs)
+                    except Exception as e:
+                        wait = next_delay(attempt, e, wait)
+                        if wait is None:
+                            settled = True
+                            raise
+                    else:
+                        settled = True
+                        circuit.record_success()
+                        return result
+                    time.sleep(wait)
+            finally:
+                if not settled:
+                    circuit.release()
+        wrapper.breaker = circuit
         return wrapper
     return decorator
 
 
 @with_db_connection
-@retry_on_failure(retries=3, delay=1)
+@retry_on_failure(retries=3, delay=1, backoff="exponential")
 def fetch_users_with_retry(conn):
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM users")
@@ -1,42 +1,64 @@
 #!/usr/bin/env python3
-import time
-import sqlite3
 import functools
+from connection_pool import with_db_connection
+from query_cache import query_cache, db_identity, in_write_transaction, track_tables
 
-# global cache dictionary
-query_cache = {}
+# the real transactional (savepoints, group commit) invalidates query_cache
+transactional = __import__('2-transactional').transactional
 
 
-# decorator to handle DB connection automatically
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
+# hashable stand-in for a bound parameter, e.g. a list for an IN clause
+def _freeze(value):
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((k, _freeze(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_freeze(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return ("set", frozenset(_freeze(v) for v in value))
+    return value
 
 
 # decorator to cache query results
-def cache_query(func):
-    @functools.wraps(func)
-    def wrapper(conn, *args, **kwargs):
-        query = kwargs.get("query") if "query" in kwargs else (args[0] if args else None)
+# usable as @cache_query or @cache_query(cache=my_cache, ttl=60)
+def cache_query(func=None, *, cache=None, ttl=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            if in_write_transaction(conn):
+                # uncommitted reads must not be cached
+                return func(conn, *args, **kwargs)
+            store = cache if cache is not None else query_cache
+            query = kwargs.get("query") if "query" in kwargs else (args[0] if args else None)
 
-        # if query exists in cache, return it
-        if query in query_cache:
-            print(f"Cache hit for query: {query}")
-            return query_cache[query]
+            # key on database, query text and every bound parameter
+            try:
+                key = (db_identity(conn), query, _freeze(args), _freeze(kwargs))
+                hash(key)
+            except TypeError:
+                # a parameter with no hashable form: run uncached
+                return func(conn, *args, **kwargs)
 
-        # otherwise execute function and cache result
-        result = func(conn, *args, **kwargs)
-        query_cache[query] = result
-        print(f"Cache miss, executing and storing result for query: {query}")
-        return result
-    return wrapper
+            # if query exists in cache, return it
+            hit, result = store.get(key)
+            if hit:
+                print(f"Cache hit for query: {query}")
+                return result
+
+            # otherwise execute function and cache result with the tables it read
+            tables = set()
+            track_tables(conn, tables)
+            try:
+                result = func(conn, *args, **kwargs)
+            finally:
+                conn.set_authorizer(None)
+            store.set(key, result, tables, ttl)
+            print(f"Cache miss, executing and storing result for query: {query}")
+            return result
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 
 @with_db_connection
@@ -47,6 +69,13 @@ def fetch_users_with_cache(conn, query):
     return cursor.fetchall()
 
 
+@with_db_connection
+@transactional
+def update_user_email(conn, user_id, new_email):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+
 # First call will cache the result
 if __name__ == "__main__":
     users = fetch_users_with_cache(query="SELECT * FROM users")
@@ -55,3 +84,9 @@ if __name__ == "__main__":
     # Second call will use the cached result
     users_again = fetch_users_with_cache(query="SELECT * FROM users")
     print("Second call:", users_again)
+
+    # A write to users through transactional invalidates the cached result
+    update_user_email(user_id=1, new_email="Crawford_Cartwright@hotmail.com")
+    users_after_write = fetch_users_with_cache(query="SELECT * FROM users")
+    print("After write:", users_after_write)
+    print("Cache stats:", query_cache.stats())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import sqlite3
+import functools
+import threading
+from contextlib import contextmanager
+
+DB_PATH = "users.db"
+
+# PRAGMAs applied once when a pooled connection is opened
+PRAGMA_PRESETS = {
+    "default": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 268435456,  # 256 MB of memory-mapped reads
+        "cache_size": -65536,  # 64 MB page cache (negative = KiB)
+        "temp_store": "MEMORY",
+    },
+}
+
+
+# thread-safe sqlite3 pool; each thread reuses its own connections
+class ConnectionPool:
+    def __init__(self, db_path=DB_PATH, pragmas="wal", max_idle_per_thread=2):
+        self.db_path = db_path
+        self.pragmas = PRAGMA_PRESETS[pragmas] if isinstance(pragmas, str) else dict(pragmas)
+        self.max_idle_per_thread = max_idle_per_thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0, "closed": 0, "in_use": 0}
+
+    def _idle(self):
+        # idle connections owned by the calling thread
+        if not hasattr(self._local, "idle"):
+            self._local.idle = []
+        return self._local.idle
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self._stats[name] += delta
+
+    def connect(self):
+        """Open a new connection with the pool's PRAGMAs applied."""
+        conn = sqlite3.connect(self.db_path)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        self._count("created")
+        return conn
+
+    def acquire(self):
+        """Return a warm connection for this thread, opening one if needed."""
+        idle = self._idle()
+        if idle:
+            conn = idle.pop()
+            self._count("reused")
+        else:
+            conn = self.connect()
+        self._count("in_use")
+        return conn
+
+    def release(self, conn):
+        """Hand a connection back; uncommitted work is rolled back."""
+        self._count("in_use", -1)
+        idle = self._idle()
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            self._count("closed")
+            return
+        if len(idle) < self.max_idle_per_thread:
+            idle.append(conn)
+        else:
+            conn.close()
+            self._count("closed")
+
+    def close_thread_connections(self):
+        """Close the calling thread's idle connections."""
+        idle = self._idle()
+        while idle:
+            idle.pop().close()
+            self._count("closed")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, db_path=self.db_path)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=None, pragmas="wal"):
+    """Return the shared pool for db_path (default DB_PATH)."""
+    db_path = db_path or DB_PATH
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = ConnectionPool(db_path, pragmas)
+        return _pools[db_path]
+
+
+# connection pinned to the current thread (e.g. by batch_commit), if any
+_pinned = threading.local()
+
+
+@contextmanager
+def pinned_connection(db_path=None):
+    """Borrow one connection and have with_db_connection reuse it in this thread."""
+    pool = get_pool(db_path)
+    conn = pool.acquire()
+    previous = getattr(_pinned, "value", None)
+    _pinned.value = (pool, conn)
+    try:
+        yield conn
+    finally:
+        _pinned.value = previous
+        pool.release(conn)
+
+
+# decorator to handle DB connection automatically
+# usable as @with_db_connection or @with_db_connection(db_path="other.db")
+def with_db_connection(func=None, *, db_path=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            pool = get_pool(db_path)
+            # inside pinned_connection, share the pinned connection
+            pinned = getattr(_pinned, "value", None)
+            if pinned is not None and pinned[0] is pool:
+                return func(pinned[1], *args, **kwargs)
+
+            # borrow a warm connection from the pool
+            conn = pool.acquire()
+            try:
+                # pass connection as first argument to function
+                result = func(conn, *args, **kwargs)
+            finally:
+                # hand the connection back to the pool instead of closing it
+                pool.release(conn)
+            return result
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, defaultdict
+
+WRITE_ACTIONS = (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE)
+
+
+# result cache with LRU + TTL eviction, a byte budget and table tags
+class QueryCache:
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (result, expires_at, size, tables)
+        self._by_table = defaultdict(set)  # table -> keys that read it
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (True, result) on a fresh hit, (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if entry[1] < time.monotonic():
+                self._remove(key)  # expired
+                self.evictions += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)  # mark as most recently used
+            self.hits += 1
+            return True, entry[0]
+
+    def set(self, key, result, tables=(), ttl=None):
+        size = _sizeof(result)
+        if size > self.max_bytes:
+            return  # would evict everything else; don't cache it
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, expires_at, size, frozenset(tables))
+            self._bytes += size
+            for table in tables:
+                self._by_table[table].add(key)
+            # evict least recently used entries until back under both limits
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_tables(self, tables):
+        """Drop every cached result that read one of these tables."""
+        with self._lock:
+            for table in tables:
+                for key in list(self._by_table.pop(table, ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key):
+        _, _, size, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+
+# global cache used by cache_query and invalidated by transactional
+query_cache = QueryCache()
+
+
+def _sizeof(obj):
+    # approximate memory held by a result (lists/tuples of scalars)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += sum(_sizeof(item) for item in obj)
+    return size
+
+
+def db_identity(conn):
+    # absolute path of the main database, so two files never share entries
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return os.path.abspath(path) if path else ":memory:"
+    return None
+
+
+def track_tables(conn, tables, actions=None):
+    # record every table the next statements read (or write, with actions)
+    def authorizer(action, arg1, arg2, db_name, trigger):
+        if actions is None and action == sqlite3.SQLITE_READ:
+            tables.add(arg1.lower())
+        elif actions is not None and action in actions:
+            tables.add(arg1.lower())
+        return sqlite3.SQLITE_OK
+    conn.set_authorizer(authorizer)
+
+
+# tables written by the open transaction on each connection (keyed by id)
+_pending_writes = {}
+
+
+def in_write_transaction(conn):
+    return id(conn) in _pending_writes
+
+
+def track_writes(conn):
+    """Start recording the tables conn writes; repeat calls are no-ops."""
+    if id(conn) not in _pending_writes:
+        _pending_writes[id(conn)] = set()
+        track_tables(conn, _pending_writes[id(conn)], WRITE_ACTIONS)
+
+
+def writes_committed(conn):
+    """After a commit: stop tracking and drop cached reads of written tables.
+
+    Invalidating only once the data is committed means no other connection
+    can re-cache the old rows in between.
+    """
+    conn.set_authorizer(None)
+    query_cache.invalidate_tables(_pending_writes.pop(id(conn), ()))
+
+
+def writes_rolled_back(conn):
+    """After a rollback: stop tracking, nothing changed."""
+    conn.set_authorizer(None)
+    _pending_writes.pop(id(conn), None)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Tests for the retry_on_failure decorator and its circuit breaker"""
+import asyncio
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+retry = __import__('3-retry_on_failure')
+
+
+def locked():
+    return sqlite3.OperationalError("database is locked")
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """retry_on_failure edge cases"""
+
+    def half_open_breaker(self):
+        """A breaker whose next call is the half-open probe"""
+        breaker = retry.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        return breaker
+
+    def test_retries_must_be_positive(self):
+        """retries=0 is rejected instead of silently returning None"""
+        with self.assertRaises(ValueError):
+            retry.retry_on_failure(retries=0)
+
+    def test_interrupt_during_backoff_releases_probe(self):
+        """KeyboardInterrupt while sleeping doesn't keep the circuit shut"""
+        breaker = self.half_open_breaker()
+
+        @retry.retry_on_failure(retries=2, delay=10, breaker=breaker,
+                                budget=retry.RetryBudget())
+        def flaky():
+            raise locked()
+
+        with patch.object(retry.time, "sleep", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                flaky()
+        self.assertFalse(breaker.probing)
+        self.assertTrue(breaker.allow_call())
+
+    def test_cancel_during_backoff_releases_probe(self):
+        """Cancelling a coroutine mid-backoff doesn't keep the circuit shut"""
+        breaker = self.half_open_breaker()
+
+        @retry.retry_on_failure(retries=2, delay=10, breaker=breaker,
+                                budget=retry.RetryBudget())
+        async def flaky():
+            raise locked()
+
+        async def run():
+            task = asyncio.ensure_future(flaky())
+            await asyncio.sleep(0.05)  # let it fail once and start sleeping
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertFalse(breaker.probing)
+        self.assertTrue(breaker.allow_call())
+
+    def test_failed_probe_reopens_circuit(self):
+        """A probe that runs out of retries opens the circuit again"""
+        breaker = self.half_open_breaker()
+        breaker.reset_timeout = 30
+
+        @retry.retry_on_failure(retries=1, breaker=breaker)
+        def flaky():
+            raise locked()
+
+        breaker.opened_at -= 30  # reset_timeout has passed
+        with self.assertRaises(sqlite3.OperationalError):
+            flaky()
+        with self.assertRaises(retry.CircuitOpenError):
+            flaky()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,16 +1,16 @@
 #!/usr/bin/python3
 import mysql.connector
-from seed import connect_to_prodev
+from seed import connect_to_prodev, stream_query, FETCH_SIZE
 
-def stream_users():
-    """Generator function that streams rows from user_data table one by one."""
-    connection = connect_to_prodev()  # connect to ALX_prodev database
-    cursor = connection.cursor(dictionary=True)  # fetch rows as dictionaries
-
-    cursor.execute("SELECT * FROM user_data")  # query all rows
+def stream_users(fetch_size=FETCH_SIZE):
+    """Generator function that streams rows from user_data table one by one.
 
-    for row in cursor:  # only 1 loop allowed
-        yield row  # yield one row at a time
+    Uses an unbuffered cursor that pulls fetch_size rows per round trip, so
+    the result set is never held in client memory all at once.
+    """
+    connection = connect_to_prodev()  # connect to ALX_prodev database
 
-    cursor.close()
-    connection.close()
+    # fetch rows as dictionaries; connection is closed once streaming ends
+    yield from stream_query(connection, "SELECT * FROM user_data",
+                            fetch_size=fetch_size, dictionary=True,
+                            close_connection=True)
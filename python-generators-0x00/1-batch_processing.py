@@ -1,36 +1,48 @@
 #!/usr/bin/python3
 import csv
-import mysql.connector
+from seed import connect_to_prodev, stream_batches
+scan = __import__('5-partitioned_scan')
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; fall back to plain Python filtering
+    np = None
+
 
 def stream_users_in_batches(batch_size):
-    """Generator that yields rows from user_data table in batches"""
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",  # replace with your password
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data;")
-
-    batch = []
-    for row in cursor:
-        batch.append(row)
-        if len(batch) == batch_size:
-            for item in batch:
-                yield item  # use yield, not return
-            batch = []
-
-    # Yield remaining rows if any
-    for item in batch:
-        yield item
-
-    cursor.close()
-    connection.close()
-
-
-def batch_processing(batch_size):
-    """Process each batch and filter users over age 25"""
-    for user in stream_users_in_batches(batch_size):
-        if user["age"] > 25:
-            yield user  # again, yield to comply with generator
+    """Generator that yields rows from user_data table in batches.
+
+    Each batch is a list of up to batch_size row dictionaries fetched with
+    a single fetchmany call.
+    """
+    connection = connect_to_prodev()
+    yield from stream_batches(connection, "SELECT * FROM user_data;",
+                              batch_size=batch_size, dictionary=True,
+                              close_connection=True)
+
+
+def filter_batch(batch, min_age=25):
+    """Return the users in a batch older than min_age.
+
+    With numpy installed the ages are compared as one array mask instead
+    of row by row.
+    """
+    if np is None:
+        return [user for user in batch if user["age"] > min_age]
+    ages = np.fromiter((user["age"] for user in batch), dtype=float,
+                       count=len(batch))
+    return [batch[i] for i in np.flatnonzero(ages > min_age)]
+
+
+def batch_processing(batch_size, partitions=None):
+    """Process each batch and filter users over age 25
+
+    With partitions set, the table is read by that many parallel
+    range scans (in no particular order) instead of one sequential scan.
+    """
+    if partitions:
+        batches = scan.partitioned_scan(partitions, batch_size)
+    else:
+        batches = stream_users_in_batches(batch_size)
+    for batch in batches:
+        yield from filter_batch(batch)  # again, yield to comply with generator
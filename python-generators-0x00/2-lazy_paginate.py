@@ -1,20 +1,83 @@
 #!/usr/bin/python3
+import base64
 seed = __import__('seed')
 
 
 def paginate_users(page_size, offset):
     """Fetch a single page of users from the database."""
     connection = seed.connect_to_prodev()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+    return rows  # This is fine here; it's a single page
+
+
+def encode_token(user_id):
+    """Turn the last user_id of a page into an opaque resume token."""
+    return base64.urlsafe_b64encode(user_id.encode()).decode()
+
+
+def decode_token(token):
+    """Turn a resume token back into the user_id to seek past (None = start)."""
+    if not token:
+        return None
+    return base64.urlsafe_b64decode(token.encode()).decode()
+
+
+def paginate_users_keyset(connection, page_size, after=None):
+    """Fetch the page of users whose user_id sorts after `after`.
+
+    Seeks on the user_id primary key instead of using OFFSET, so every page
+    costs the same no matter how deep into the table it is.
+    """
     cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+    if after is None:
+        cursor.execute(
+            "SELECT * FROM user_data ORDER BY user_id LIMIT %s", (page_size,)
+        )
+    else:
+        cursor.execute(
+            "SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s",
+            (after, page_size)
+        )
     rows = cursor.fetchall()
     cursor.close()
-    connection.close()
-    return rows  # This is fine here; it's a single page
+    return rows
+
+
+def keyset_pages(page_size, token=None):
+    """Generator that yields (page, token) pairs using keyset pagination.
+
+    One connection is reused for every page. Pass a yielded token back in
+    to resume right after the page it came with.
+    """
+    connection = seed.connect_to_prodev()
+    after = decode_token(token)
+    try:
+        while True:
+            page = paginate_users_keyset(connection, page_size, after)
+            if not page:  # no more rows
+                break
+            after = page[-1]['user_id']
+            yield page, encode_token(after)
+    finally:
+        connection.close()
+
+
+def lazy_pagination(page_size, keyset=False):
+    """Generator that lazily yields pages one by one.
 
+    With keyset=True pages are read with keyset_pages (ordered by user_id,
+    single connection) instead of LIMIT/OFFSET.
+    """
+    if keyset:
+        yield from (page for page, _ in keyset_pages(page_size))
+        return
 
-def lazy_pagination(page_size):
-    """Generator that lazily yields pages one by one."""
     offset = 0
     while True:
         page = paginate_users(page_size, offset)
@@ -1,26 +1,163 @@
 #!/usr/bin/python3
+import math
+import mysql.connector
 seed = __import__('seed')
 
+STATS = ("count", "sum", "avg", "min", "max")
+
+
 def stream_user_ages():
     """Generator that yields ages from the user_data table one by one"""
     connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT age FROM user_data")
-    for row in cursor:
-        yield row['age']  # yield one age at a time
-    cursor.close()
-    connection.close()
-
-def average_age():
-    """Calculate average age using the generator"""
-    total = 0
-    count = 0
-    for age in stream_user_ages():  # loop over generator
-        total += age
-        count += 1
-    if count == 0:
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT age FROM user_data")
+        for row in cursor:
+            yield row['age']  # yield one age at a time
+        cursor.close()
+    finally:
+        connection.close()  # also runs if the generator is abandoned
+
+
+def stream_age_batches(batch_size=seed.FETCH_SIZE):
+    """Generator that yields lists of ages, one fetchmany chunk at a time"""
+    connection = seed.connect_to_prodev()
+    for rows in seed.stream_batches(connection, "SELECT age FROM user_data",
+                                    batch_size=batch_size,
+                                    close_connection=True):
+        yield [row[0] for row in rows]
+
+
+class RunningStats:
+    """Single-pass, numerically stable accumulator (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+        self.min = None
+        self.max = None
+
+    def update(self, values):
+        """Fold a chunk of values into the running statistics."""
+        for value in values:
+            value = float(value)
+            self.count += 1
+            self.sum += value
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    @property
+    def variance(self):
+        """Population variance of the values seen so far."""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self):
+        """Population standard deviation of the values seen so far."""
+        return math.sqrt(self.variance)
+
+
+def _nearest_rank(count, pct):
+    """0-based index of the pct percentile (nearest-rank method)."""
+    return max(0, math.ceil(pct / 100 * count) - 1)
+
+
+def _sql_age_stats(percentiles):
+    """Compute the stats in MySQL.
+
+    All percentiles come from one ROW_NUMBER() OVER (ORDER BY age) query
+    filtered to the wanted ranks, so the table is sorted once on the server
+    and only one row per percentile is sent back. Window functions need
+    MySQL 8; on older servers age_stats falls back to streaming.
+    """
+    connection = seed.connect_to_prodev()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT COUNT(age), SUM(age), AVG(age), MIN(age), MAX(age) "
+            "FROM user_data"
+        )
+        row = cursor.fetchone()
+        result = {
+            name: float(value) if value is not None else None
+            for name, value in zip(STATS, row)
+        }
+        result["count"] = int(row[0])
+        ranks = {pct: _nearest_rank(result["count"], pct)
+                 for pct in percentiles}
+        picked = {}
+        if ranks and result["count"]:
+            wanted = sorted(set(ranks.values()))
+            placeholders = ", ".join(["%s"] * len(wanted))
+            cursor.execute(
+                "SELECT pos, age FROM ("
+                "SELECT age, ROW_NUMBER() OVER (ORDER BY age) - 1 AS pos "
+                f"FROM user_data) ranked WHERE pos IN ({placeholders})",
+                tuple(wanted)
+            )
+            picked = {int(pos): float(age) for pos, age in cursor.fetchall()}
+        for pct, rank in ranks.items():
+            result[f"p{pct:g}"] = picked.get(rank)
+        return result
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _streaming_age_stats(percentiles, batch_size):
+    """Compute the stats in one pass over fetchmany chunks.
+
+    Percentiles need every value, so they keep the ages in memory.
+    """
+    stats = RunningStats()
+    ages = [] if percentiles else None
+    for batch in stream_age_batches(batch_size):
+        stats.update(batch)
+        if ages is not None:
+            ages.extend(float(age) for age in batch)
+    result = {
+        "count": stats.count,
+        "sum": stats.sum if stats.count else None,
+        "avg": stats.mean if stats.count else None,
+        "min": stats.min,
+        "max": stats.max,
+    }
+    if ages is not None:
+        ages.sort()
+        for pct in percentiles:
+            result[f"p{pct:g}"] = (
+                ages[_nearest_rank(len(ages), pct)] if ages else None
+            )
+    return result
+
+
+def age_stats(percentiles=(), pushdown=True, batch_size=seed.FETCH_SIZE):
+    """Return count/sum/avg/min/max (and pN percentiles) of user ages.
+
+    With pushdown the aggregation runs in SQL; if that fails, or with
+    pushdown=False, ages are streamed through a RunningStats accumulator.
+    """
+    if pushdown:
+        try:
+            return _sql_age_stats(percentiles)
+        except mysql.connector.Error as e:
+            print(f"Aggregation push-down failed, streaming instead: {e}")
+    return _streaming_age_stats(percentiles, batch_size)
+
+
+def average_age(pushdown=True):
+    """Calculate average age, in SQL or by streaming the ages"""
+    avg = age_stats(pushdown=pushdown)["avg"]
+    if avg is None:
         return 0
-    return total / count
+    return avg
 
 if __name__ == "__main__":
     avg = average_age()
@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+import multiprocessing
+import queue
+import threading
+seed = __import__('seed')
+
+QUEUE_BATCHES = 4  # batches buffered per partition before a worker blocks
+
+
+def partition_bounds(connection, partitions):
+    """Split user_data into key ranges with roughly equal row counts.
+
+    Returns a list of (low, high) user_id bounds; low is inclusive, high is
+    exclusive and None means unbounded. The split points are picked on the
+    server in one ROW_NUMBER() OVER (ORDER BY user_id) pass over the
+    primary key, so only the partitions - 1 boundary ids are sent back.
+    Window functions need MySQL 8.
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM user_data")
+    total = cursor.fetchone()[0]
+    offsets = {total * i // partitions for i in range(1, partitions)}
+    splits = []
+    if total and offsets:
+        offsets = sorted(offsets)
+        placeholders = ", ".join(["%s"] * len(offsets))
+        cursor.execute(
+            "SELECT user_id FROM ("
+            "SELECT user_id, ROW_NUMBER() OVER (ORDER BY user_id) - 1 AS pos "
+            f"FROM user_data) ranked WHERE pos IN ({placeholders}) "
+            "ORDER BY pos",
+            tuple(offsets)
+        )
+        for (user_id,) in cursor.fetchall():
+            if not splits or user_id > splits[-1]:
+                splits.append(user_id)
+    cursor.close()
+    edges = [None] + splits + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _range_query(low, high):
+    """Build the SELECT for one key range."""
+    clauses, params = [], []
+    if low is not None:
+        clauses.append("user_id >= %s")
+        params.append(low)
+    if high is not None:
+        clauses.append("user_id < %s")
+        params.append(high)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"SELECT * FROM user_data{where} ORDER BY user_id", tuple(params)
+
+
+def _put(out, item, stop):
+    """Put an item on a bounded queue, giving up once stop is set."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(q):
+    """Discard whatever is currently waiting on a queue."""
+    try:
+        while True:
+            q.get_nowait()
+    except queue.Empty:
+        pass
+
+
+def _scan_partition(index, low, high, batch_size, out, stop, pooled):
+    """Worker: stream one key range into out as (index, batch) items.
+
+    Finishes with (index, None), or (index, RuntimeError) if the scan failed.
+    """
+    try:
+        connection = seed.connect_to_prodev(pooled=pooled)
+        if connection is None:
+            raise RuntimeError("could not connect to ALX_prodev")
+        query, params = _range_query(low, high)
+        for batch in seed.stream_batches(connection, query, params,
+                                         batch_size=batch_size,
+                                         dictionary=True,
+                                         close_connection=True):
+            if not _put(out, (index, batch), stop):
+                return
+        _put(out, (index, None), stop)
+    except Exception as e:  # sent back as a plain error so it can be pickled
+        _put(out, (index, RuntimeError(f"partition {index} failed: {e}")), stop)
+
+
+def partitioned_scan(partitions=seed.POOL_SIZE, batch_size=seed.FETCH_SIZE,
+                     ordered=False, use_processes=False):
+    """Generator that yields batches of user_data rows scanned in parallel.
+
+    The table is split into key ranges over user_id and each range is
+    streamed by its own thread (sharing the connection pool) or, with
+    use_processes=True, its own process (own connection). Unordered mode
+    yields batches as soon as any worker has one; ordered mode yields them
+    in user_id order while later partitions keep prefetching.
+    """
+    connection = seed.connect_to_prodev()
+    try:
+        bounds = partition_bounds(connection, partitions)
+    finally:
+        connection.close()
+
+    if use_processes:
+        ctx = multiprocessing.get_context()
+        make_queue, stop, worker = ctx.Queue, ctx.Event(), ctx.Process
+    else:
+        make_queue, stop, worker = queue.Queue, threading.Event(), threading.Thread
+    maxsize = QUEUE_BATCHES * (1 if ordered else len(bounds))
+    queues = [make_queue(maxsize) for _ in (bounds if ordered else [None])]
+
+    workers = []
+    for index, (low, high) in enumerate(bounds):
+        out = queues[index] if ordered else queues[0]
+        workers.append(worker(
+            target=_scan_partition,
+            args=(index, low, high, batch_size, out, stop, not use_processes),
+            daemon=True
+        ))
+    for w in workers:
+        w.start()
+
+    try:
+        remaining = len(bounds)
+        current = 0
+        while remaining:
+            _, item = queues[current if ordered else 0].get()
+            if isinstance(item, Exception):
+                raise item
+            if item is None:
+                remaining -= 1
+                current += 1
+                continue
+            yield item
+    finally:
+        stop.set()  # unblocks workers if the consumer stopped early
+        for w in workers:
+            while w.is_alive():
+                for q in queues:
+                    _drain(q)  # a process can't exit with unflushed queue data
+                w.join(timeout=0.1)
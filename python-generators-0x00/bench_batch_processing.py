@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+"""Compare rows/sec of batch_processing against the old row-by-row version."""
+import sys
+import time
+from seed import connect_to_prodev
+
+processing = __import__('1-batch_processing')
+
+
+def row_by_row_processing(batch_size):
+    """Previous implementation: batches are re-yielded one row at a time."""
+    connection = connect_to_prodev()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM user_data;")
+        batch = []
+        for row in cursor:
+            batch.append(row)
+            if len(batch) == batch_size:
+                for item in batch:
+                    if item["age"] > 25:
+                        yield item
+                batch = []
+        for item in batch:
+            if item["age"] > 25:
+                yield item
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def run(name, func, batch_size):
+    """Consume func(batch_size) and print rows/sec."""
+    start = time.perf_counter()
+    count = sum(1 for _ in func(batch_size))
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {count} rows in {elapsed:.2f}s ({count / elapsed:.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    run("row by row", row_by_row_processing, size)
+    run("batched", processing.batch_processing, size)
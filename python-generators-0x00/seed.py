@@ -1,13 +1,23 @@
 #!/usr/bin/python3
 import mysql.connector
 import csv
+import threading
+import time
 import uuid
+import weakref
+from collections import deque
 
 DB_HOST = "localhost"
 DB_USER = "root"
 DB_PASSWORD = ""
 DB_NAME = "ALX_prodev"
 TABLE_NAME = "user_data"
+CHUNK_SIZE = 1000  # rows sent per executemany / commit
+FETCH_SIZE = 500  # rows pulled per fetchmany when streaming
+POOL_SIZE = 5  # max open connections in the shared pool
+POOL_ACQUIRE_TIMEOUT = 10  # seconds to wait for a free connection
+POOL_IDLE_TIMEOUT = 300  # idle connections older than this are closed
+POOL_HEALTH_CHECK_INTERVAL = 30  # ping connections idle longer than this
 
 def connect_db():
     """Connect to MySQL server (no database specified)."""
@@ -28,14 +38,190 @@ def create_database(connection):
     cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME};")
     cursor.close()
 
-def connect_to_prodev():
-    """Connect to the ALX_prodev database."""
+class PoolTimeout(mysql.connector.errors.PoolError):
+    """Raised when no pooled connection frees up within the acquire timeout."""
+
+
+class PooledConnection:
+    """A pooled connection; close() hands it back to the pool.
+
+    A wrapper that is dropped without close() still gives its slot back
+    when it is garbage collected.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        # runs at most once: on close() or when the wrapper is collected
+        self._finalizer = weakref.finalize(self, pool.release, connection)
+        self._finalizer.atexit = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        """Return the connection to the pool instead of closing it."""
+        if self._connection is not None:
+            self._connection = None
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of warm ALX_prodev connections.
+
+    Connections idle longer than health_check_interval are pinged before
+    reuse, ones idle longer than idle_timeout are closed, and acquire()
+    waits up to acquire_timeout for a free slot.
+    """
+
+    def __init__(self, size=POOL_SIZE, acquire_timeout=POOL_ACQUIRE_TIMEOUT,
+                 idle_timeout=POOL_IDLE_TIMEOUT,
+                 health_check_interval=POOL_HEALTH_CHECK_INTERVAL,
+                 **connect_kwargs):
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+        self._idle = deque()  # (connection, last_used), oldest on the left
+        self._open = 0  # idle + checked out
+        self._cond = threading.Condition()
+
+    def _evict_idle(self, now):
+        """Close connections that sat idle longer than idle_timeout."""
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            connection, _ = self._idle.popleft()
+            self._open -= 1
+            _close_quietly(connection)
+
+    def _discard(self, connection):
+        """Close a broken connection and free its slot."""
+        _close_quietly(connection)
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def acquire(self, timeout=None):
+        """Check out a connection, opening a new one if the pool has room."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    self._evict_idle(now)
+                    if self._idle:
+                        connection, last_used = self._idle.pop()  # warmest first
+                        break
+                    if self._open < self.size:
+                        self._open += 1
+                        connection, last_used = None, now
+                        break
+                    if now >= deadline:
+                        raise PoolTimeout(
+                            f"No connection available after {timeout}s"
+                        )
+                    self._cond.wait(deadline - now)
+
+            if connection is None:
+                try:
+                    connection = mysql.connector.connect(**self.connect_kwargs)
+                except mysql.connector.Error:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                return PooledConnection(self, connection)
+
+            # ping outside the lock so a slow check doesn't block other callers
+            if (time.monotonic() - last_used <= self.health_check_interval
+                    or connection.is_connected()):
+                return PooledConnection(self, connection)
+            self._discard(connection)
+
+    def release(self, connection):
+        """Put a connection back, dropping it if it can't be reused cleanly."""
+        try:
+            if connection.unread_result:
+                # a stream was abandoned mid-result; draining could take ages
+                raise mysql.connector.Error("unread result")
+            if connection.in_transaction:
+                connection.rollback()
+        except mysql.connector.Error:
+            self._discard(connection)
+            return
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection."""
+        with self._cond:
+            while self._idle:
+                connection, _ = self._idle.popleft()
+                self._open -= 1
+                _close_quietly(connection)
+
+    def stats(self):
+        """Return the number of open and idle connections."""
+        with self._cond:
+            return {"size": self.size, "open": self._open,
+                    "idle": len(self._idle)}
+
+
+def _close_quietly(connection):
+    """Close a raw connection, ignoring errors from a dead socket."""
     try:
+        connection.close()
+    except mysql.connector.Error:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the shared ALX_prodev pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(host=DB_HOST, user=DB_USER,
+                                   password=DB_PASSWORD, database=DB_NAME)
+        return _pool
+
+def configure_pool(**options):
+    """Replace the shared pool, e.g. configure_pool(size=10, acquire_timeout=5)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = ConnectionPool(host=DB_HOST, user=DB_USER,
+                               password=DB_PASSWORD, database=DB_NAME,
+                               **options)
+        return _pool
+
+def connect_to_prodev(allow_local_infile=False, pooled=True):
+    """Connect to the ALX_prodev database.
+
+    By default the connection comes from the shared pool and close()
+    returns it there. LOAD DATA connections (allow_local_infile=True) and
+    pooled=False open a dedicated connection.
+    """
+    try:
+        if pooled and not allow_local_infile:
+            return get_pool().acquire()
         connection = mysql.connector.connect(
             host=DB_HOST,
             user=DB_USER,
             password=DB_PASSWORD,
-            database=DB_NAME
+            database=DB_NAME,
+            allow_local_infile=allow_local_infile
         )
         return connection
     except mysql.connector.Error as e:
@@ -57,30 +243,126 @@ def create_table(connection):
     cursor.close()
     print(f"Table {TABLE_NAME} created successfully")
 
-def insert_data(connection, csv_file):
-    """Insert data from CSV into the user_data table if it doesn't exist."""
-    cursor = connection.cursor()
+def _read_chunks(csv_file, chunk_size):
+    """Generator that reads the CSV lazily and yields lists of row tuples."""
     with open(csv_file, newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f)
+        chunk = []
         for row in reader:
             user_id = row.get('user_id') or str(uuid.uuid4())
-            name = row['name']
-            email = row['email']
-            age = row['age']
-            cursor.execute(f"""
-                INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age)
-                VALUES (%s, %s, %s, %s)
-            """, (user_id, name, email, age))
-    connection.commit()
+            chunk.append((user_id, row['name'], row['email'], row['age']))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def _report_progress(total, start):
+    """Print rows inserted so far and the rows/sec rate."""
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0
+    print(f"Inserted {total} rows ({rate:.0f} rows/sec)")
+
+def insert_data(connection, csv_file, chunk_size=CHUNK_SIZE,
+                use_load_data=False, progress=True):
+    """Insert data from CSV into the user_data table if it doesn't exist.
+
+    Rows are streamed from the file in chunks of chunk_size and sent with
+    executemany (one multi-row INSERT per chunk), committing after each chunk
+    so memory and transaction size stay bounded. Set use_load_data=True to
+    use the LOAD DATA LOCAL INFILE fast path instead.
+    Returns the number of rows sent to the server.
+    """
+    if use_load_data:
+        return load_data_infile(connection, csv_file, progress=progress)
+
+    cursor = connection.cursor()
+    start = time.perf_counter()
+    total = 0
+    for chunk in _read_chunks(csv_file, chunk_size):
+        cursor.executemany(f"""
+            INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age)
+            VALUES (%s, %s, %s, %s)
+        """, chunk)
+        connection.commit()  # commit per chunk, not per row
+        total += len(chunk)
+        if progress:
+            _report_progress(total, start)
     cursor.close()
+    return total
+
+def load_data_infile(connection, csv_file, progress=True):
+    """Bulk load the CSV with LOAD DATA LOCAL INFILE.
+
+    The connection must be opened with allow_local_infile=True
+    (see connect_to_prodev) and the server must have local_infile enabled.
+    Missing user_id values are generated server-side with UUID().
+    Returns the number of rows loaded.
+    """
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f), [])
+    # map CSV columns to table columns, reading user_id into a variable
+    columns = ", ".join('@user_id' if col == 'user_id' else col for col in header)
+    if 'user_id' in header:
+        set_clause = "SET user_id = COALESCE(NULLIF(@user_id, ''), UUID())"
+    else:
+        set_clause = "SET user_id = UUID()"
 
-def stream_rows(connection):
-    """Generator that streams rows one by one from the user_data table."""
     cursor = connection.cursor()
-    cursor.execute(f"SELECT * FROM {TABLE_NAME};")
-    while True:
-        row = cursor.fetchone()
-        if row is None:
-            break
-        yield row
+    start = time.perf_counter()
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE %s
+        IGNORE INTO TABLE {TABLE_NAME}
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+        LINES TERMINATED BY '\\n'
+        IGNORE 1 LINES
+        ({columns})
+        {set_clause}
+    """, (csv_file,))
+    connection.commit()
+    total = cursor.rowcount
     cursor.close()
+    if progress:
+        _report_progress(total, start)
+    return total
+
+def stream_batches(connection, query, params=None, batch_size=FETCH_SIZE,
+                   dictionary=False, close_connection=False):
+    """Generator that yields lists of up to batch_size rows for a query.
+
+    Uses an unbuffered cursor and fetchmany, so only one batch is held in
+    client memory at a time and the first batch is available after a single
+    round trip. With close_connection=True the connection is closed when the
+    generator finishes or is discarded early.
+    """
+    cursor = connection.cursor(buffered=False, dictionary=dictionary)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        if not connection.unread_result:
+            cursor.close()
+        elif not close_connection:
+            connection.consume_results()  # needed before the cursor can close
+            cursor.close()
+        if close_connection:
+            connection.close()  # any unread rows are dropped with the connection
+
+def stream_query(connection, query, params=None, fetch_size=FETCH_SIZE,
+                 dictionary=False, close_connection=False):
+    """Generator that streams query results one row at a time.
+
+    Rows are read fetch_size at a time through stream_batches.
+    """
+    for rows in stream_batches(connection, query, params, fetch_size,
+                               dictionary, close_connection):
+        yield from rows
+
+def stream_rows(connection, fetch_size=FETCH_SIZE):
+    """Generator that streams rows one by one from the user_data table."""
+    yield from stream_query(connection, f"SELECT * FROM {TABLE_NAME};",
+                            fetch_size=fetch_size)